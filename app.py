@@ -1,10 +1,20 @@
-from flask import Flask, request, render_template_string
-from predict import predict_score, load_models
+import io
+import os
+import time
+import hashlib
+import mimetypes
+from flask import (Flask, request, render_template, jsonify, make_response, Response, g, stream_with_context,
+                   send_from_directory, abort)
+from predict import predict_score, predict_scores, predict_probabilities, scores_from_rates, UNKNOWN_TEAM
+from registry import registry
+import metrics
+from bulk import parse_fixture, split_dates, stream_predictions, guess_format, text_lines, FORMATS, CHUNK_SIZE
+from assets import AssetMap, load_asset_manifest, ASSET_MAX_AGE, ENCODING_SUFFIXES
 
 app = Flask(__name__)
 
-# Load models and teams
-_, _, le, _, _ = load_models()
+# Load models and teams once; predict_score reuses the shared state
+registry.get()
 
 # Map all 20 EPL teams to crest URLs
 crest_urls = {
@@ -47,6 +57,13 @@ crest_urls = {
 # Use all teams that have crest images, not just those in the current data
 teams = sorted(crest_urls.keys())
 
+# Built by `python assets.py`: optimized, content-hashed copies of the static images.
+# Without a build the original files are served.
+ASSET_DIR = os.path.join(app.static_folder, 'dist')
+assets = AssetMap(load_asset_manifest(os.path.join(ASSET_DIR, 'manifest.json')))
+crest_urls = {team: assets.url(url) for team, url in crest_urls.items()}
+app.jinja_env.globals['asset_url'] = assets.url
+
 
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -187,9 +204,9 @@ HTML_TEMPLATE = """
         <div class="row justify-content-center">
             <div class="col-md-10 col-lg-8">
                 <div class="card p-5 text-center">
-                    <img src="/static/images/Premier_League_Logo.svg" alt="EPL Logo" style="width:120px; margin-bottom:20px;" class="epl-logo">
+                    <img src="{{ asset_url('/static/images/Premier_League_Logo.svg') }}" alt="EPL Logo" style="width:120px; margin-bottom:20px;" class="epl-logo">
                     <h1 class="mb-4 fw-bold">EPL Score Predictor</h1>
-                    <form method="post">
+                    <form method="post" action="{{ url_for('home') }}">
                         <div class="row g-3">
                             <div class="col-md-5">
                                 <label for="home_team" class="form-label fw-bold"><i class="fas fa-home me-2"></i>Home Team</label>
@@ -269,22 +286,195 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# Compiled once at startup; render_template_string would recompile it on every request
+HOME_TEMPLATE = app.jinja_env.from_string(HTML_TEMPLATE)
+# Pages embed the hashed asset URLs, so a new asset build is a new page version
+TEMPLATE_HASH = hashlib.sha256((HTML_TEMPLATE + assets.version).encode()).hexdigest()[:12]
+# How long browsers and proxies may reuse a page before revalidating its ETag
+PAGE_MAX_AGE = int(os.environ.get('EPL_PAGE_MAX_AGE', '300'))
+UNKNOWN_TEAM_ERROR = "One or both team names are unknown. Please check spelling."
+
+def render_home(prediction=None, error=None, home_team=None, away_team=None):
+    with metrics.timed('render'):
+        return render_template(HOME_TEMPLATE, prediction=prediction, error=error, teams=teams, home_team=home_team, away_team=away_team, crest_urls=crest_urls)
+
+def cached_page(etag_parts, render):
+    """
+    Answer with 304 if the client already holds this ETag, otherwise render the page;
+    either way mark it cacheable for PAGE_MAX_AGE seconds.
+    """
+    etag = hashlib.sha256('\0'.join(etag_parts).encode()).hexdigest()[:20]
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = PAGE_MAX_AGE
+    return response
 
 @app.route('/', methods=['GET', 'POST'])
 def home():
+    if request.method == 'GET':
+        return cached_page([TEMPLATE_HASH], render_home)
     prediction = None
     error = None
-    home_team = None
-    away_team = None
-    if request.method == 'POST':
-        home_team = request.form.get('home_team')
-        away_team = request.form.get('away_team')
-        home_goals, away_goals = predict_score(home_team, away_team)
-        if home_goals == "Unknown team(s)":
-            error = "One or both team names are unknown. Please check spelling."
+    home_team = request.form.get('home_team')
+    away_team = request.form.get('away_team')
+    home_goals, away_goals = predict_score(home_team, away_team)
+    if home_goals == UNKNOWN_TEAM:
+        error = UNKNOWN_TEAM_ERROR
+    else:
+        prediction = (home_goals, away_goals)
+    return render_home(prediction, error, home_team, away_team)
+
+@app.route('/predict/<home_team>/<away_team>')
+def predict_page(home_team, away_team):
+    """
+    Cacheable prediction page. The ETag covers the template, the serving model version and
+    the pairing, so revalidations are answered with 304 until a new model is published.
+    """
+    state = registry.get()
+    if home_team not in state.team_index.team_ids or away_team not in state.team_index.team_ids:
+        metrics.UNKNOWN_TEAMS.inc()
+        return render_home(None, UNKNOWN_TEAM_ERROR, home_team, away_team), 404
+
+    def render():
+        # Predict with the state the names and the ETag came from, even if a reload lands meanwhile
+        return render_home(predict_score(home_team, away_team, state=state), None, home_team, away_team)
+
+    return cached_page([TEMPLATE_HASH, state.version, home_team, away_team], render)
+
+@app.route('/static/dist/<path:filename>')
+def hashed_asset(filename):
+    """
+    Serve a built asset, precompressed when the client accepts brotli or gzip. Names are
+    content hashes, so responses are cacheable for a year and never revalidated.
+    """
+    if filename not in assets.encodings:
+        abort(404)
+    served, encoding = filename, None
+    for candidate in assets.encodings[filename]:
+        if request.accept_encodings[candidate]:
+            served, encoding = filename + ENCODING_SUFFIXES[candidate], candidate
+            break
+    response = send_from_directory(ASSET_DIR, served, mimetype=mimetypes.guess_type(filename)[0],
+                                   max_age=ASSET_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.before_request
+def start_timing():
+    g.start_time = time.perf_counter()
+    metrics.start_trace()
+
+@app.after_request
+def record_timing(response):
+    stages = metrics.end_trace()
+    start = g.get('start_time')
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    endpoint = request.endpoint or 'unknown'
+    if endpoint != 'metrics_endpoint':
+        metrics.REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+    metrics.REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    if metrics.TIMING_HEADER:
+        response.headers['Server-Timing'] = metrics.server_timing(stages, elapsed)
+    return response
+
+@app.route('/healthz')
+def healthz():
+    # Liveness: the process is up and answering
+    return jsonify(status='ok', pid=os.getpid())
+
+@app.route('/readyz')
+def readyz():
+    # Readiness: a model version is loaded and can serve predictions
+    if not registry.loaded:
+        return jsonify(status='loading', pid=os.getpid()), 503
+    return jsonify(status='ready', version=registry.version, pid=os.getpid())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def parse_fixtures(payload):
+    """
+    Accept either a list of fixtures or {"fixtures": [...]}, where each fixture is
+    {"home_team": ..., "away_team": ...} or a [home_team, away_team] pair, optionally
+    with a "date" (or third element) to predict it as of that day.
+    """
+    if isinstance(payload, dict):
+        payload = payload.get('fixtures')
+    if not isinstance(payload, list):
+        raise ValueError("Expected a list of fixtures")
+    return [parse_fixture(item) for item in payload]
+
+@app.route('/api/predict', methods=['POST'])
+def api_predict():
+    try:
+        fixtures, as_of = split_dates(parse_fixtures(request.get_json(silent=True)))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    # ?probabilities=1 adds expected goals and home/draw/away probabilities
+    with_probabilities = request.args.get('probabilities') == '1'
+    # One state for the predictions and the version reported with them
+    state = registry.get()
+    if with_probabilities:
+        rates, _, outcomes, errors = predict_probabilities(fixtures, as_of=as_of, state=state, return_errors=True)
+        scores = scores_from_rates(rates, errors)
+    else:
+        scores = predict_scores(fixtures, as_of, state)
+
+    predictions = []
+    for i, ((home_team, away_team), (home_goals, away_goals)) in enumerate(zip(fixtures, scores)):
+        result = {'home_team': home_team, 'away_team': away_team}
+        if as_of is not None and as_of[i] is not None:
+            result['date'] = as_of[i]
+        if isinstance(home_goals, str):
+            # UNKNOWN_TEAM, or NO_HISTORY for a date before both teams' first match
+            result['error'] = home_goals
         else:
-            prediction = (home_goals, away_goals)
-    return render_template_string(HTML_TEMPLATE, prediction=prediction, error=error, teams=teams, home_team=home_team, away_team=away_team, crest_urls=crest_urls)
+            result['home_goals'] = home_goals
+            result['away_goals'] = away_goals
+            if with_probabilities:
+                result['expected_goals'] = [round(float(r), 4) for r in rates[i]]
+                result['probabilities'] = {name: round(float(p), 4)
+                                           for name, p in zip(['home_win', 'draw', 'away_win'], outcomes[i])}
+        predictions.append(result)
+    return jsonify(version=state.version, predictions=predictions)
+
+@app.route('/api/predict/bulk', methods=['POST'])
+def api_predict_bulk():
+    """
+    Stream predictions for a CSV or NDJSON fixtures file of any size, sent as the request
+    body or as a multipart upload named "file". The input is read in chunks and each chunk
+    is predicted as one batch and written out before the next is read.
+    """
+    upload = request.files.get('file')
+    if upload is not None:
+        # Flask closes uploaded files when the view returns, before the response has
+        # streamed; detach the spooled file so the generator can keep reading it
+        stream, upload.stream = upload.stream, io.BytesIO()
+        source = upload.filename or upload.mimetype
+    else:
+        stream, source = request.stream, request.mimetype
+    in_format = request.args.get('input_format') or guess_format(source)
+    out_format = request.args.get('format') or in_format
+    if in_format not in FORMATS or out_format not in FORMATS:
+        return jsonify(error=f"Formats must be one of: {', '.join(FORMATS)}"), 400
+    chunk_size = min(request.args.get('chunk_size', CHUNK_SIZE, type=int), CHUNK_SIZE * 10)
+    probabilities = request.args.get('probabilities') == '1'
+
+    body = stream_predictions(text_lines(stream), in_format, out_format, max(chunk_size, 1), probabilities)
+    mimetype = 'text/csv' if out_format == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(body), mimetype=mimetype)
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,216 @@
+import os
+import re
+import io
+import importlib.util
+import gzip
+import json
+import shutil
+import hashlib
+import zipfile
+import argparse
+from atomic import atomic_write_bytes
+
+# Static asset build: minified SVGs, crest PNGs resized to their display size, gzip and
+# brotli variants, all under content-hashed names that can be cached forever.
+STATIC_DIR = 'static'
+SOURCE_DIRS = ['images']
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+ASSET_MANIFEST = os.path.join(DIST_DIR, 'manifest.json')
+# Crests are shown at 70x70 CSS pixels (.team-logo)
+CREST_SIZE = 70
+# Decimal places kept in SVG path coordinates; crests are drawn at 70px from viewBoxes
+# of a few hundred units, so 0.01 units is far below a device pixel
+SVG_PRECISION = 2
+# Only keep a compressed variant if it saves at least this fraction of the bytes
+MIN_SAVING = 0.05
+# Hashed names never change content, so browsers may keep them for a year
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+def minify_svg(text, precision=SVG_PRECISION):
+    """
+    Conservative SVG minifier: drops the XML prolog, comments, editor metadata, titles and
+    ids nothing refers to, rounds path coordinates and removes whitespace between tags.
+    """
+    text = re.sub(r'<\?xml.*?\?>|<!DOCTYPE[^>]*>|<!--.*?-->', '', text, flags=re.S)
+    text = re.sub(r'<(metadata|title|desc|sodipodi:namedview)\b[^>]*?(/>|>.*?</\1>)', '', text, flags=re.S)
+    text = re.sub(r'\s+(sodipodi|inkscape):[\w-]+="[^"]*"', '', text)
+
+    referenced = set(re.findall(r'(?:url\(\s*#|href="#)([^)"\s]+)', text))
+    text = re.sub(r'\s+id="([^"]*)"', lambda m: m.group(0) if m.group(1) in referenced else '', text)
+
+    def round_number(n):
+        value = f"{float(n.group(0)):.{precision}f}".rstrip('0').rstrip('.')
+        if '.' in value:
+            value = value.replace('0.', '.', 1) if value.startswith(('0.', '-0.')) else value
+        # "1.001.5" is two numbers; once the first loses its point they need a separator
+        if '.' not in value and n.string[n.end():n.end() + 1] == '.':
+            value += ' '
+        return value
+
+    def round_numbers(match):
+        values = re.sub(r'-?\d*\.\d+(?:[eE][-+]?\d+)?', round_number, match.group(2))
+        return match.group(1) + '="' + ' '.join(values.split()) + '"'
+
+    text = re.sub(r'\b(d|points)="([^"]*)"', round_numbers, text)
+    text = re.sub(r'>\s+<', '><', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip().encode()
+
+def resize_png(data, size=CREST_SIZE):
+    """
+    Downscale a PNG to fit size x size, or return it unchanged if Pillow is not installed.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return data
+    image = Image.open(io.BytesIO(data))
+    if max(image.size) <= size:
+        return data
+    image.thumbnail((size, size), Image.LANCZOS)
+    buf = io.BytesIO()
+    image.save(buf, format='PNG', optimize=True)
+    return buf.getvalue()
+
+def png_from_zip(path):
+    """
+    The first PNG inside a downloaded logo archive.
+    """
+    with zipfile.ZipFile(path) as archive:
+        for name in archive.namelist():
+            if name.lower().endswith('.png'):
+                return archive.read(name)
+    raise ValueError(f"No PNG in {path}")
+
+def compressed_variants(data):
+    """
+    {encoding: bytes} of the gzip and (if the brotli package is installed) brotli forms
+    of data that are worth serving.
+    """
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+        variants['br'] = brotli.compress(data, quality=11)
+    except ImportError:
+        pass
+    return {encoding: blob for encoding, blob in variants.items() if len(blob) <= len(data) * (1 - MIN_SAVING)}
+
+ENCODING_SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+# Build steps that are skipped without their package: {module: what is lost}
+OPTIONAL_PACKAGES = {
+    'PIL': "Pillow is not installed: crest PNGs are copied at full size instead of resized",
+    'brotli': "brotli is not installed: no .br variants are built, only gzip",
+}
+
+def missing_packages():
+    """
+    Warnings for the optional build packages (see requirements.txt) that are not installed.
+    """
+    return [warning for module, warning in OPTIONAL_PACKAGES.items() if importlib.util.find_spec(module) is None]
+
+def build_asset(source):
+    """
+    Optimized bytes and output extension for one source file, or None to skip it.
+    """
+    ext = os.path.splitext(source)[1].lower()
+    if ext == '.svg':
+        with open(source, encoding='utf-8') as f:
+            return minify_svg(f.read()), '.svg'
+    if ext == '.png':
+        with open(source, 'rb') as f:
+            return resize_png(f.read()), '.png'
+    if ext == '.zip':
+        return resize_png(png_from_zip(source)), '.png'
+    if ext in ('.jpg', '.jpeg', '.gif', '.webp', '.ico', '.css', '.js'):
+        with open(source, 'rb') as f:
+            return f.read(), ext
+    return None
+
+def build_assets(static_dir=STATIC_DIR, dist_dir=DIST_DIR, clean=False):
+    """
+    Build every file under the SOURCE_DIRS of static_dir into dist_dir and write the
+    manifest mapping each source path (relative to static_dir) to its hashed file.
+    Previously built files are kept, so pages rendered from an older manifest still load,
+    unless clean=True. Returns the manifest.
+    """
+    for warning in missing_packages():
+        print(f"WARNING: {warning} (pip install -r requirements.txt)")
+    os.makedirs(dist_dir, exist_ok=True)
+    assets = {}
+    for source_dir in SOURCE_DIRS:
+        for name in sorted(os.listdir(os.path.join(static_dir, source_dir))):
+            source = os.path.join(static_dir, source_dir, name)
+            built = build_asset(source)
+            if built is None:
+                continue
+            data, ext = built
+            stem = os.path.splitext(name)[0]
+            filename = f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+            variants = compressed_variants(data)
+            for blob_name, blob in [(filename, data)] + [(filename + ENCODING_SUFFIXES[e], b) for e, b in variants.items()]:
+                path = os.path.join(dist_dir, blob_name)
+                if not os.path.exists(path):
+                    atomic_write_bytes(path, blob)
+            assets[f"{source_dir}/{name}"] = {
+                'file': filename,
+                'source_bytes': os.path.getsize(source),
+                'bytes': len(data),
+                'encodings': {encoding: len(blob) for encoding, blob in variants.items()},
+            }
+
+    version = hashlib.sha256(json.dumps(assets, sort_keys=True).encode()).hexdigest()[:12]
+    manifest = {'version': version, 'assets': assets}
+    atomic_write_bytes(os.path.join(dist_dir, 'manifest.json'), json.dumps(manifest, indent=2).encode())
+
+    if clean:
+        keep = {'manifest.json'}
+        for entry in assets.values():
+            keep.add(entry['file'])
+            keep.update(entry['file'] + ENCODING_SUFFIXES[e] for e in entry['encodings'])
+        for name in os.listdir(dist_dir):
+            if name not in keep:
+                path = os.path.join(dist_dir, name)
+                shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+    return manifest
+
+def load_asset_manifest(path=ASSET_MANIFEST):
+    """
+    The built asset manifest, or an empty one if the build step has not been run.
+    """
+    if not os.path.exists(path):
+        return {'version': '', 'assets': {}}
+    with open(path) as f:
+        return json.load(f)
+
+class AssetMap:
+    """
+    Static URLs rewritten to their built, hashed files; unbuilt assets keep their URL.
+    """
+    def __init__(self, manifest, url_prefix='/static/'):
+        self.version = manifest['version']
+        self.prefix = url_prefix
+        self.urls = {url_prefix + source: f"{url_prefix}dist/{entry['file']}"
+                     for source, entry in manifest['assets'].items()}
+        # Hashed file name -> encodings with a precompressed variant, best first
+        self.encodings = {entry['file']: sorted(entry['encodings'], key=lambda e: e != 'br')
+                          for entry in manifest['assets'].values()}
+
+    def url(self, url):
+        return self.urls.get(url, url)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Optimize and fingerprint the static assets into {DIST_DIR}.")
+    parser.add_argument('--clean', action='store_true', help="remove files the new manifest does not reference")
+    args = parser.parse_args()
+
+    manifest = build_assets(clean=args.clean)
+    total_source = total_built = total_gzip = 0
+    for source, entry in manifest['assets'].items():
+        smallest = min([entry['bytes'], *entry['encodings'].values()])
+        print(f"{source:45s} {entry['source_bytes'] / 1024:8.1f} KB -> {entry['bytes'] / 1024:7.1f} KB"
+              f" ({smallest / 1024:6.1f} KB compressed)  {entry['file']}")
+        total_source += entry['source_bytes']
+        total_built += entry['bytes']
+        total_gzip += entry['encodings'].get('gzip', entry['bytes'])
+    print(f"Total: {total_source / 1024:.0f} KB -> {total_built / 1024:.0f} KB, {total_gzip / 1024:.0f} KB gzipped."
+          f" Manifest {manifest['version']} written to {ASSET_MANIFEST}")
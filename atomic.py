@@ -0,0 +1,13 @@
+import os
+import threading
+
+def atomic_write_bytes(path, data):
+    """
+    Write bytes to path via a temporary file and os.replace, so readers never see a partial file.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
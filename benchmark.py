@@ -0,0 +1,600 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import socket
+import subprocess
+from io import StringIO
+from contextlib import contextmanager, redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+from data import COLUMNS, DATA_FILE, TEAM_COLUMNS, preprocess_data, add_team_features, write_parquet, load_dataset
+from features import TeamIndex, FeatureStore, FEATURES, HOME_STATE, AWAY_STATE
+from forest import CompiledForest
+from teams import TeamRegistry
+from timeline import WINDOWS, HALFLIVES, STATS, team_timeline, add_timeline_features
+
+TEAM_POOL = ['Arsenal', 'Aston Villa', 'Bournemouth', 'Brentford', 'Brighton', 'Burnley', 'Cardiff', 'Chelsea',
+             'Crystal Palace', 'Everton', 'Fulham', 'Hull', 'Ipswich', 'Leeds', 'Leicester', 'Liverpool', 'Luton',
+             'Man City', 'Man United', 'Middlesbrough', 'Newcastle', 'Norwich', "Nott'm Forest", 'QPR',
+             'Sheffield United', 'Southampton', 'Stoke', 'Sunderland', 'Swansea', 'Tottenham', 'Watford',
+             'West Brom', 'West Ham', 'Wolves']
+
+def synthetic_season(season_idx, seed=0, n_teams=20):
+    """
+    Generate one deterministic double round-robin season in the raw COLUMNS schema.
+    """
+    rng = np.random.default_rng(seed + season_idx)
+    teams = list(rng.choice(TEAM_POOL, n_teams, replace=False))
+    pairs = [(h, a) for h in teams for a in teams if h != a]
+    order = rng.permutation(len(pairs))
+    start = pd.Timestamp(2000 + season_idx, 8, 12)
+    n = len(pairs)
+    df = pd.DataFrame({
+        'Date': [(start + pd.Timedelta(days=int(i // (n_teams // 2)) * 7)).strftime('%d/%m/%Y') for i in range(n)],
+        'HomeTeam': [pairs[i][0] for i in order],
+        'AwayTeam': [pairs[i][1] for i in order],
+        'FTHG': rng.poisson(1.5, n), 'FTAG': rng.poisson(1.15, n),
+        'HST': rng.poisson(5.5, n), 'AST': rng.poisson(4.3, n),
+        'HC': rng.poisson(6.0, n), 'AC': rng.poisson(4.7, n),
+        'HF': rng.poisson(11.0, n), 'AF': rng.poisson(11.6, n),
+        'HY': rng.poisson(1.5, n), 'AY': rng.poisson(1.8, n),
+        'HR': rng.binomial(1, 0.05, n), 'AR': rng.binomial(1, 0.07, n),
+    })[COLUMNS]
+    df['Season'] = f"{(2000 + season_idx) % 100:02d}{(2001 + season_idx) % 100:02d}"
+    return df
+
+def synthetic_dataset(n_seasons=5, seed=0):
+    """
+    Processed multi-season dataset plus the TeamRegistry it was encoded with.
+    """
+    teams = TeamRegistry()
+    frames = [preprocess_data(synthetic_season(i, seed), teams)[0] for i in range(n_seasons)]
+    # Round-trip through CSV text, as the original epl_data.csv pipeline did, so numerics are float64
+    df = pd.read_csv(StringIO(pd.concat(frames, ignore_index=True).to_csv(index=False)))
+    return df, teams
+
+def legacy_features(df, le, home_team, away_team):
+    """
+    The original per-request lookup in predict_score: mask, sort and take the latest row.
+    """
+    home_encoded = le.transform([home_team])[0]
+    away_encoded = le.transform([away_team])[0]
+    home_latest = df[df['HomeTeam'] == home_team].sort_values('Date').iloc[-1] if not df[df['HomeTeam'] == home_team].empty else None
+    away_latest = df[df['AwayTeam'] == away_team].sort_values('Date').iloc[-1] if not df[df['AwayTeam'] == away_team].empty else None
+
+    if home_latest is None or away_latest is None:
+        home_stats = df[['HST', 'HC', 'HF', 'HY', 'HR']].mean()
+        away_stats = df[['AST', 'AC', 'AF', 'AY', 'AR']].mean()
+        home_rolling_gf = df['FTHG'].mean()
+        home_rolling_ga = df['FTAG'].mean()
+        home_form = 1.5
+        away_rolling_gf = df['FTAG'].mean()
+        away_rolling_ga = df['FTHG'].mean()
+        away_form = 1.5
+        home_strength = 0
+        away_strength = 0
+    else:
+        home_stats = home_latest[['HST', 'HC', 'HF', 'HY', 'HR']]
+        away_stats = away_latest[['AST', 'AC', 'AF', 'AY', 'AR']]
+        home_rolling_gf = home_latest['HomeRollingGF']
+        home_rolling_ga = home_latest['HomeRollingGA']
+        home_form = home_latest['HomeForm']
+        away_rolling_gf = away_latest['AwayRollingGF']
+        away_rolling_ga = away_latest['AwayRollingGA']
+        away_form = away_latest['AwayForm']
+        home_strength = home_latest['HomeStrength']
+        away_strength = away_latest['AwayStrength']
+
+    form_interaction = home_form * away_form
+    strength_interaction = home_strength * away_strength
+
+    return np.array([[home_encoded, away_encoded, home_stats['HST'], away_stats['AST'],
+                      home_stats['HC'], away_stats['AC'], home_stats['HF'], away_stats['AF'],
+                      home_stats['HY'], away_stats['AY'], home_stats['HR'], away_stats['AR'],
+                      home_rolling_gf, home_rolling_ga, away_rolling_gf, away_rolling_ga,
+                      home_form, away_form, home_strength, away_strength, form_interaction, strength_interaction]],
+                    dtype=float)
+
+def legacy_add_team_features(df):
+    """
+    The original row-wise apply / per-group lambda version of data.add_team_features.
+    """
+    df['HomePoints'] = df.apply(lambda x: 3 if x['FTHG'] > x['FTAG'] else 1 if x['FTHG'] == x['FTAG'] else 0, axis=1)
+    df['AwayPoints'] = df.apply(lambda x: 3 if x['FTAG'] > x['FTHG'] else 1 if x['FTAG'] == x['FTHG'] else 0, axis=1)
+
+    df['HomeRollingGF'] = df.groupby('HomeTeam')['FTHG'].transform(lambda x: x.rolling(5, min_periods=1).mean())
+    df['HomeRollingGA'] = df.groupby('HomeTeam')['FTAG'].transform(lambda x: x.rolling(5, min_periods=1).mean())
+    df['HomeForm'] = df.groupby('HomeTeam')['HomePoints'].transform(lambda x: x.rolling(5, min_periods=1).mean())
+
+    df['AwayRollingGF'] = df.groupby('AwayTeam')['FTAG'].transform(lambda x: x.rolling(5, min_periods=1).mean())
+    df['AwayRollingGA'] = df.groupby('AwayTeam')['FTHG'].transform(lambda x: x.rolling(5, min_periods=1).mean())
+    df['AwayForm'] = df.groupby('AwayTeam')['AwayPoints'].transform(lambda x: x.rolling(5, min_periods=1).mean())
+
+    df['HomeRollingGF'] = df['HomeRollingGF'].fillna(df['FTHG'].mean())
+    df['HomeRollingGA'] = df['HomeRollingGA'].fillna(df['FTAG'].mean())
+    df['HomeForm'] = df['HomeForm'].fillna(1.5)
+    df['AwayRollingGF'] = df['AwayRollingGF'].fillna(df['FTAG'].mean())
+    df['AwayRollingGA'] = df['AwayRollingGA'].fillna(df['FTHG'].mean())
+    df['AwayForm'] = df['AwayForm'].fillna(1.5)
+
+    home_strength = df.groupby('HomeTeam')['FTHG'].mean() - df.groupby('HomeTeam')['FTAG'].mean()
+    away_strength = df.groupby('AwayTeam')['FTAG'].mean() - df.groupby('AwayTeam')['FTHG'].mean()
+    df['HomeStrength'] = df['HomeTeam'].map(home_strength).fillna(0)
+    df['AwayStrength'] = df['AwayTeam'].map(away_strength).fillna(0)
+
+    df['FormInteraction'] = df['HomeForm'] * df['AwayForm']
+    df['StrengthInteraction'] = df['HomeStrength'] * df['AwayStrength']
+    return df
+
+def time_per_call(fn, args_list, repeat=3):
+    """
+    Best-of-repeat mean seconds per call of fn over args_list.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for args in args_list:
+            fn(*args)
+        best = min(best, (time.perf_counter() - start) / len(args_list))
+    return best
+
+def bench_team_index(n_seasons=4, seed=0):
+    """
+    Compare the legacy DataFrame scan against TeamIndex gathers, checking they agree exactly.
+    """
+    df, _ = synthetic_dataset(n_seasons, seed)
+    # Encode the whole pool so teams absent from the data exercise the fallback path
+    le = LabelEncoder().fit(TEAM_POOL)
+    start = time.perf_counter()
+    index = TeamIndex(df, le.classes_)
+    build = time.perf_counter() - start
+
+    teams = list(le.classes_)
+    rng = np.random.default_rng(seed)
+    pairs = [tuple(rng.choice(teams, 2, replace=False)) for _ in range(200)]
+
+    for home, away in pairs:
+        expected = legacy_features(df, le, home, away)
+        actual = index.assemble([index.encode(home)], [index.encode(away)])
+        assert np.array_equal(expected, actual), (home, away)
+
+    legacy = time_per_call(lambda h, a: legacy_features(df, le, h, a), pairs)
+    indexed = time_per_call(lambda h, a: index.assemble([index.encode(h)], [index.encode(a)]), pairs)
+    print(f"Team index ({len(df)} rows, {len(teams)} teams): build {build * 1e3:.2f} ms")
+    print(f"  legacy lookup: {legacy * 1e6:9.1f} us/call")
+    print(f"  index gather:  {indexed * 1e6:9.1f} us/call ({legacy / indexed:.0f}x faster)")
+    return {'build': build, 'legacy_lookup': legacy, 'index_gather': indexed}
+
+def bench_feature_store(n_seasons=10, seed=0, n_fixtures=10000):
+    """
+    Point-in-time lookups: check FeatureStore against a DataFrame scan for the latest row
+    before each date, with strength brute-forced from the season's matches strictly before
+    it, then time a scalar lookup and a vectorized as-of join.
+    """
+    df, teams = synthetic_dataset(n_seasons, seed)
+    df['Date'] = pd.to_datetime(df['Date'])
+    start = time.perf_counter()
+    store = FeatureStore(df, teams.teams)
+    build = time.perf_counter() - start
+
+    rng = np.random.default_rng(seed)
+    dates = df['Date'].to_numpy()[rng.integers(len(df), size=n_fixtures)]
+    home_ids = rng.integers(len(teams), size=n_fixtures)
+    away_ids = rng.integers(len(teams), size=n_fixtures)
+    for i in range(100):
+        for side, column, state, sign in [('home', 'HomeTeam', HOME_STATE, 1), ('away', 'AwayTeam', AWAY_STATE, -1)]:
+            team = teams.teams[home_ids[i]]
+            before = df[(df[column] == team) & (df['Date'] < dates[i])]
+            actual = store.state(team, dates[i], side)
+            if before.empty:
+                assert actual is None, (team, dates[i])
+                continue
+            latest = before.sort_values('Date', kind='stable').iloc[-1]
+            assert np.array_equal(latest[state[:-1]].to_numpy(dtype=float), actual[:-1]), (team, dates[i])
+            # Running strength: mean goal difference of the season's earlier matches on this side
+            season = before[before['Season'] == latest['Season']]
+            strength = sign * (season['FTHG'] - season['FTAG']).mean()
+            assert np.isclose(strength, actual[-1], rtol=0, atol=1e-12), (team, dates[i], strength, actual[-1])
+
+    lookup = time_per_call(lambda team, date: store.state(team, date), [(teams.teams[h], d) for h, d in zip(home_ids[:200], dates)])
+    join = time_per_call(lambda: store.assemble(home_ids, away_ids, dates), [()])
+    print(f"Feature store ({len(df)} rows, {len(teams)} teams): build {build * 1e3:.2f} ms")
+    print(f"  scalar lookup: {lookup * 1e6:9.1f} us/call")
+    print(f"  as-of join:    {join * 1e6 / n_fixtures:9.2f} us/fixture ({n_fixtures} fixtures)")
+    return {'build': build, 'lookup': lookup, 'as_of_join': join}
+
+def bench_add_team_features(n_seasons=25, seed=0, repeat=3):
+    """
+    Time legacy vs vectorized add_team_features on n_seasons of synthetic matches,
+    treated as one frame, and check the feature columns are identical.
+    """
+    raw = pd.concat([synthetic_season(i, seed) for i in range(n_seasons)], ignore_index=True)
+    raw['Date'] = pd.to_datetime(raw['Date'], format='%d/%m/%Y')
+    raw = raw.sort_values('Date', kind='stable').reset_index(drop=True)
+
+    expected = legacy_add_team_features(raw.copy())
+    actual = add_team_features(raw.copy())
+    for col in expected.columns:
+        assert np.array_equal(expected[col].to_numpy(), actual[col].to_numpy()), col
+        assert expected[col].dtype == actual[col].dtype, col
+
+    legacy = time_per_call(lambda: legacy_add_team_features(raw.copy()), [()], repeat)
+    vectorized = time_per_call(lambda: add_team_features(raw.copy()), [()], repeat)
+    print(f"add_team_features ({len(raw)} matches, {n_seasons} seasons):")
+    print(f"  legacy:     {legacy * 1e3:9.1f} ms")
+    print(f"  vectorized: {vectorized * 1e3:9.1f} ms ({legacy / vectorized:.1f}x faster)")
+    return {'legacy': legacy, 'vectorized': vectorized}
+
+def grouped_timeline_features(df, windows=WINDOWS, halflives=HALFLIVES):
+    """
+    The same timeline features with one pandas groupby pass per stat and window.
+    """
+    timeline = team_timeline(df)
+    groups = timeline.groupby('Team', observed=True, sort=False)
+    stats = {}
+    for stat in STATS:
+        previous = groups[stat].shift(1)
+        by_team = previous.groupby(timeline['Team'], observed=True, sort=False)
+        for w in windows:
+            stats[f"{stat}{w}"] = by_team.rolling(w, min_periods=1).mean().reset_index(level=0, drop=True)
+        for h in halflives:
+            stats[f"{stat}Ewm{h}"] = groups[stat].transform(lambda s: s.ewm(halflife=h).mean().shift(1))
+    home = timeline['Home'].to_numpy()
+    columns = {}
+    for side, rows in [('Home', home), ('Away', ~home)]:
+        for name, values in stats.items():
+            column = np.empty(len(df))
+            column[timeline['Match'].to_numpy()[rows]] = values.sort_index().to_numpy()[rows]
+            columns[f"{side}{name}"] = column
+    return pd.concat([df, pd.DataFrame(columns, index=df.index)], axis=1)
+
+def bench_timeline(n_seasons=25, seed=0, repeat=3):
+    """
+    Time the single-pass timeline engine against per-window groupby passes, for the default
+    windows and for four times as many, and check the columns agree.
+    """
+    df, _ = synthetic_dataset(n_seasons, seed)
+    df['Date'] = pd.to_datetime(df['Date'])
+    results = {}
+    for label, windows in [('default', WINDOWS), ('many', tuple(range(2, 2 + 4 * len(WINDOWS))))]:
+        expected = grouped_timeline_features(df.copy(), windows)
+        actual = add_timeline_features(df.copy(), windows)
+        for col in actual.columns.difference(df.columns):
+            assert np.allclose(expected[col], actual[col], equal_nan=True), col
+
+        grouped = time_per_call(lambda: grouped_timeline_features(df.copy(), windows), [()], repeat)
+        engine = time_per_call(lambda: add_timeline_features(df.copy(), windows), [()], repeat)
+        print(f"Timeline features ({len(df)} matches, {n_seasons} seasons, {len(windows)} windows, {len(HALFLIVES)} half-lives):")
+        print(f"  groupby passes: {grouped * 1e3:9.1f} ms")
+        print(f"  single pass:    {engine * 1e3:9.1f} ms ({grouped / engine:.1f}x faster)")
+        results[f"{label}_groupby"] = grouped
+        results[f"{label}_engine"] = engine
+    return results
+
+def bench_tree_evaluator(n_seasons=10, seed=0):
+    """
+    Check CompiledForest against XGBRegressor.predict (margins bit-exact, outputs within
+    float32 rounding) and compare single-row and batch latency.
+    """
+    from sklearn.preprocessing import StandardScaler
+    from xgboost import XGBRegressor
+
+    df, _ = synthetic_dataset(n_seasons, seed)
+    X = df[FEATURES].to_numpy(dtype=float)
+    scaler = StandardScaler().fit(X)
+    X_scaled = scaler.transform(X)
+    results = {}
+    for target in ['FTHG', 'FTAG']:
+        model = XGBRegressor(random_state=42, n_estimators=200, max_depth=6, learning_rate=0.1, objective='count:poisson')
+        model.fit(X_scaled, df[target])
+        forest = CompiledForest.from_booster(model.get_booster(), scaler)
+
+        expected = model.predict(X_scaled)
+        actual = forest.predict(X)
+        margin = model.get_booster().inplace_predict(X_scaled, predict_type='margin')
+        assert np.array_equal(margin, forest.predict_margin(X)), target
+        np.testing.assert_allclose(actual, expected, rtol=1e-6)
+        assert np.array_equal(actual.astype(int), expected.astype(int)), target
+
+        rows = [(X[i:i + 1],) for i in range(200)]
+        xgb_single = time_per_call(lambda x: model.predict(scaler.transform(x)), rows)
+        compiled_single = time_per_call(lambda x: forest.predict(x), rows)
+        xgb_batch = time_per_call(lambda: model.predict(scaler.transform(X)), [()])
+        compiled_batch = time_per_call(lambda: forest.predict(X), [()])
+        print(f"Tree evaluator, {target} model ({forest.max_depth} deep, {len(forest.roots)} trees):")
+        print(f"  single row: scaler+XGBRegressor {xgb_single * 1e6:8.1f} us, compiled {compiled_single * 1e6:8.1f} us")
+        print(f"  {len(X)} rows:  scaler+XGBRegressor {xgb_batch * 1e3:8.2f} ms, compiled {compiled_batch * 1e3:8.2f} ms")
+        results.update({f"{target}_xgb_single": xgb_single, f"{target}_compiled_single": compiled_single,
+                        f"{target}_xgb_batch": xgb_batch, f"{target}_compiled_batch": compiled_batch})
+    return results
+
+@contextmanager
+def scratch_dir():
+    """
+    Run the block inside a temporary working directory. Artifacts are relative to the
+    working directory, like in the real pipeline.
+    """
+    workdir = tempfile.mkdtemp(prefix='epl-bench-')
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        yield workdir
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def write_synthetic_dataset(frames, teams):
+    """
+    Stitch processed seasons together like data.build_dataset and write DATA_FILE.
+    Returns the dataset and the team list in id order.
+    """
+    df_all = pd.concat(frames, ignore_index=True)
+    for col in TEAM_COLUMNS:
+        df_all[col] = df_all[col].astype(teams.dtype())
+    df_all['Season'] = df_all['Season'].astype('category')
+    write_parquet(df_all, DATA_FILE)
+    return df_all, list(teams.teams)
+
+def bench_pipeline(n_seasons=10, seed=0):
+    """
+    Time every stage end to end on synthetic seasons in a scratch directory: preprocessing,
+    training, evaluation, model load and single / batch predict_score.
+    """
+    from model import train_models
+    from evaluate import evaluate_models
+    from registry import ModelRegistry
+    import predict
+
+    raw = [synthetic_season(i, seed) for i in range(n_seasons)]
+    results = {}
+    with scratch_dir() as workdir:
+        start = time.perf_counter()
+        registry = TeamRegistry()
+        frames = [preprocess_data(season, registry)[0] for season in raw]
+        results['preprocess_data'] = time.perf_counter() - start
+        df_all, teams = write_synthetic_dataset(frames, registry)
+
+        df = load_dataset(FEATURES + ['FTHG', 'FTAG'])
+        with redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            train_models(df, teams)
+            results['train_models'] = time.perf_counter() - start
+            start = time.perf_counter()
+            evaluate_models()
+            results['evaluate_models'] = time.perf_counter() - start
+
+        results['model_load'] = time_per_call(
+            lambda: ModelRegistry(workdir, check_interval=None).reload(force=True), [()])
+        results['model_load_no_pairings'] = time_per_call(
+            lambda: ModelRegistry(workdir, check_interval=None, precompute_pairings=False).reload(force=True), [()])
+
+        rng = np.random.default_rng(seed)
+        pairs = [tuple(rng.choice(teams, 2, replace=False)) for _ in range(200)]
+        fixtures = [(h, a) for h in teams for a in teams if h != a][:380]
+        # Served from the pairings table, then through the models themselves
+        predict.registry.reload(force=True)
+        results['predict_score'] = time_per_call(predict.predict_score, pairs)
+        results['predict_scores_380'] = time_per_call(predict.predict_scores, [(fixtures,)])
+        predict.registry.precompute_pairings = False
+        predict.registry.reload(force=True)
+        results['predict_score_model'] = time_per_call(predict.predict_score, pairs)
+        results['predict_scores_380_model'] = time_per_call(predict.predict_scores, [(fixtures,)])
+
+    print(f"Pipeline ({len(df_all)} matches, {n_seasons} seasons, {len(teams)} teams):")
+    for name, seconds in results.items():
+        print(f"  {name:24s} {seconds * 1e3:10.2f} ms")
+    return results
+
+def smaps_mb(pid):
+    """
+    Rss, Pss and private memory of a process in MB (Linux /proc only).
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {'rss': fields['Rss'], 'pss': fields['Pss'],
+            'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)}
+
+def child_pids(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_ready(url, timeout=60.0):
+    import requests
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready in {timeout:.0f}s")
+
+def write_synthetic_artifacts(n_seasons=5, seed=0):
+    """
+    Write a synthetic dataset and a trained model bundle to the working directory, as
+    data.py and model.py would. Returns the team list.
+    """
+    from model import train_models
+
+    registry = TeamRegistry()
+    raw = [synthetic_season(i, seed) for i in range(n_seasons)]
+    _, teams = write_synthetic_dataset([preprocess_data(season, registry)[0] for season in raw], registry)
+    with redirect_stdout(io.StringIO()):
+        train_models(load_dataset(FEATURES + ['FTHG', 'FTAG']), teams)
+    return teams
+
+def bench_serving(n_seasons=5, seed=0, worker_counts=(1, 2, 4), duration=5.0, concurrency=8):
+    """
+    Run serve.py on synthetic artifacts with 1, 2 and 4 workers and measure memory per
+    worker and single-fixture POST /api/predict throughput from concurrent clients.
+    """
+    import requests
+
+    serve = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'serve.py')
+    results = {}
+    with scratch_dir() as workdir:
+        teams = write_synthetic_artifacts(n_seasons, seed)
+        rng = np.random.default_rng(seed)
+        fixtures = [[str(team) for team in rng.choice(teams, 2, replace=False)] for _ in range(200)]
+
+        print(f"Serving ({concurrency} clients, {duration:.0f}s per run, {os.cpu_count()} CPUs):")
+        for n_workers in worker_counts:
+            port = free_port()
+            base = f"http://127.0.0.1:{port}"
+            server = subprocess.Popen([sys.executable, serve, '--port', str(port), '--workers', str(n_workers)],
+                                      cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_ready(f"{base}/readyz")
+
+                def client(i):
+                    ok = errors = 0
+                    session = requests.Session()
+                    deadline = time.monotonic() + duration
+                    while time.monotonic() < deadline:
+                        try:
+                            r = session.post(f"{base}/api/predict", json=[fixtures[(i + ok + errors) % len(fixtures)]])
+                            ok, errors = (ok + 1, errors) if r.status_code == 200 else (ok, errors + 1)
+                        except requests.RequestException:
+                            errors += 1
+                    return ok, errors
+
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    counts = list(pool.map(client, range(concurrency)))
+                ok = sum(c[0] for c in counts)
+                errors = sum(c[1] for c in counts)
+                rps = ok / duration
+                results[f"workers_{n_workers}_per_request"] = duration / max(ok, 1)
+
+                line = f"  {n_workers} workers: {rps:8.1f} req/s, {errors} errors"
+                try:
+                    master = smaps_mb(server.pid)
+                    workers = [smaps_mb(pid) for pid in child_pids(server.pid)]
+                    private = sum(w['private'] for w in workers) / len(workers)
+                    total_pss = master['pss'] + sum(w['pss'] for w in workers)
+                    results[f"workers_{n_workers}_worker_private_mb"] = private
+                    results[f"workers_{n_workers}_total_pss_mb"] = total_pss
+                    line += (f"; master RSS {master['rss']:.0f} MB, per worker RSS "
+                             f"{sum(w['rss'] for w in workers) / len(workers):.0f} MB / private {private:.1f} MB, "
+                             f"total PSS {total_pss:.0f} MB")
+                except (OSError, KeyError, ZeroDivisionError):
+                    pass
+                print(line)
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+    return results
+
+BENCHMARKS = {
+    'team-index': bench_team_index,
+    'feature-store': bench_feature_store,
+    'features': bench_add_team_features,
+    'timeline': bench_timeline,
+    'tree-evaluator': bench_tree_evaluator,
+    'pipeline': bench_pipeline,
+    'serving': bench_serving,
+}
+
+def run_metadata():
+    """
+    Where and on what a benchmark run happened, stored next to its results.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import sklearn
+    import xgboost
+    return {
+        'commit': commit,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'xgboost': xgboost.__version__,
+    }
+
+def compare_results(base_file, new_file, threshold=0.10, noise_floor=1e-5):
+    """
+    Print per-metric changes between two result files and return the regressions, i.e.
+    metrics more than threshold (a fraction) and noise_floor seconds slower in new_file.
+    Metrics named *_mb are memory in MB (lower is better, with a 1 MB noise floor).
+    """
+    with open(base_file) as f:
+        base = json.load(f)
+    with open(new_file) as f:
+        new = json.load(f)
+    print(f"base: {base['meta'].get('commit')} ({base['meta']['created_at']})")
+    print(f"new:  {new['meta'].get('commit')} ({new['meta']['created_at']})")
+
+    regressions = []
+    for bench, metrics in new['results'].items():
+        for name, seconds in metrics.items():
+            old = base['results'].get(bench, {}).get(name)
+            key = f"{bench}.{name}"
+            scale, unit, floor = (1, 'MB', 1.0) if name.endswith('_mb') else (1e3, 'ms', noise_floor)
+            if old is None:
+                print(f"  {key:40s} {'':>13s} {seconds * scale:10.2f} {unit}  (new)")
+                continue
+            change = seconds / old - 1 if old else 0.0
+            flag = ''
+            if change > threshold and seconds - old > floor:
+                regressions.append(key)
+                flag = '  REGRESSION'
+            print(f"  {key:40s} {old * scale:10.2f} {unit} {seconds * scale:10.2f} {unit}  {change:+7.1%}{flag}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run offline benchmarks on synthetic EPL data.")
+    parser.add_argument('names', nargs='*', help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument('--seasons', type=int, help="number of synthetic seasons (default: per benchmark)")
+    parser.add_argument('--seed', type=int, default=0, help="synthetic data seed")
+    parser.add_argument('--out', help="write results as JSON to this file")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'),
+                        help="compare two result files and exit 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="slowdown that counts as a regression, as a fraction (default: 0.10)")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare_results(*args.compare, threshold=args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions.")
+        sys.exit(0)
+
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+    kwargs = {'seed': args.seed}
+    if args.seasons:
+        kwargs['n_seasons'] = args.seasons
+    results = {name: BENCHMARKS[name](**kwargs) for name in args.names or BENCHMARKS}
+
+    if args.out:
+        meta = dict(run_metadata(), seed=args.seed, seasons=args.seasons)
+        with open(args.out, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=2)
+        print(f"Results written to {args.out}")
@@ -0,0 +1,260 @@
+import io
+import re
+import sys
+import csv
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+from predict import predict_rates, predict_probabilities, scores_from_rates
+
+# Fixtures read, predicted and written per step; bounds memory whatever the input size
+CHUNK_SIZE = 5000
+FORMATS = ('csv', 'ndjson')
+HOME_COLUMNS = ('home_team', 'HomeTeam', 'home')
+AWAY_COLUMNS = ('away_team', 'AwayTeam', 'away')
+DATE_COLUMNS = ('date', 'Date', 'as_of')
+CSV_FIELDS = ['home_team', 'away_team', 'home_goals', 'away_goals', 'error']
+PROBABILITY_FIELDS = ['home_xg', 'away_xg', 'home_win', 'draw', 'away_win']
+
+ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+def text_lines(binary):
+    """
+    Text lines of a binary stream: UTF-8 with or without a BOM. Bytes that are not UTF-8
+    decode to U+FFFD, and the readers turn rows holding one into invalid-fixture errors,
+    so a bad byte never aborts the stream.
+    """
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', errors='replace', newline='')
+
+# What text_lines decodes an invalid byte to
+REPLACEMENT = '\ufffd'
+
+def parse_date(value):
+    """
+    ISO date string (YYYY-MM-DD) of a fixture's as-of date; raises ValueError for anything
+    else, including empty strings and numbers, which NumPy would read as NaT or epoch days.
+    """
+    if not isinstance(value, str) or not ISO_DATE.fullmatch(value.strip()):
+        raise ValueError(f"Invalid date (expected YYYY-MM-DD): {value!r}")
+    try:
+        date = np.datetime64(value.strip(), 'D')
+    except ValueError:
+        date = np.datetime64('NaT')
+    if np.isnat(date):
+        raise ValueError(f"Invalid date (expected YYYY-MM-DD): {value!r}")
+    return str(date)
+
+def parse_fixture(item):
+    """
+    (home_team, away_team) from {"home_team": ..., "away_team": ...} or a [home, away] pair.
+    A "date" key or third element predicts the fixture as of that day: (home, away, date).
+    """
+    if isinstance(item, dict):
+        if item.get('date') is not None:
+            return item.get('home_team'), item.get('away_team'), parse_date(item['date'])
+        return item.get('home_team'), item.get('away_team')
+    if isinstance(item, (list, tuple)) and len(item) == 2:
+        return item[0], item[1]
+    if isinstance(item, (list, tuple)) and len(item) == 3:
+        return item[0], item[1], parse_date(item[2])
+    raise ValueError(f"Expected a {{home_team, away_team}} object or a [home, away(, date)] list, got {item!r}")
+
+def split_dates(fixtures):
+    """
+    (home, away) pairs and the as_of argument for predict_rates: None if no fixture is
+    dated, else one date (or None) per fixture.
+    """
+    pairs = [fixture[:2] for fixture in fixtures]
+    dates = [fixture[2] if len(fixture) > 2 else None for fixture in fixtures]
+    return pairs, (dates if any(date is not None for date in dates) else None)
+
+def csv_columns(first):
+    """
+    (home, away, date) column positions named by a CSV header row, date None if it has no
+    date column, or None if the row is not a header naming the home and away columns.
+    """
+    header = [name.strip().lstrip('\ufeff') for name in first]
+    home_names = [i for i, name in enumerate(header) if name in HOME_COLUMNS]
+    away_names = [i for i, name in enumerate(header) if name in AWAY_COLUMNS]
+    date_names = [i for i, name in enumerate(header) if name in DATE_COLUMNS]
+    if not (home_names and away_names):
+        return None
+    return home_names[0], away_names[0], (date_names[0] if date_names else None)
+
+def iter_csv(lines):
+    """
+    Fixtures from CSV lines. A header naming the home/away columns is used if present
+    (home_team/away_team or HomeTeam/AwayTeam); otherwise the first two columns are taken.
+    A date (or Date) column in the header makes fixtures (home, away, date). A row that
+    cannot be parsed is yielded as a ValueError in its place.
+    """
+    reader = csv.reader(lines)
+    first = next(reader, None)
+    if first is None:
+        return
+    columns = csv_columns(first)
+    if columns is None:
+        columns, number, reader = (0, 1, None), 0, itertools.chain([first], reader)
+    else:
+        number = 1
+    home_col, away_col, date_col = columns
+    for row in reader:
+        number += 1
+        if not row:
+            continue
+        if any(REPLACEMENT in cell for cell in row):
+            yield ValueError(f"invalid fixture: row {number}: not valid UTF-8")
+            continue
+        if len(row) <= max(home_col, away_col):
+            yield ValueError(f"invalid fixture: row {number}: expected home and away columns, got {row!r}")
+            continue
+        try:
+            if date_col is not None and date_col < len(row) and row[date_col].strip():
+                yield row[home_col].strip(), row[away_col].strip(), parse_date(row[date_col].strip())
+            else:
+                yield row[home_col].strip(), row[away_col].strip()
+        except ValueError as e:
+            yield ValueError(f"invalid fixture: row {number}: {e}")
+
+def iter_ndjson(lines):
+    """
+    Fixtures from newline-delimited JSON, one object or [home, away(, date)] list per line.
+    A line that cannot be parsed is yielded as a ValueError in its place.
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.strip().lstrip('\ufeff')
+        if REPLACEMENT in line:
+            yield ValueError(f"invalid fixture: line {number}: not valid UTF-8")
+        elif line:
+            try:
+                yield parse_fixture(json.loads(line))
+            except ValueError as e:
+                yield ValueError(f"invalid fixture: line {number}: {e}")
+
+def read_fixtures(lines, fmt='csv', chunk_size=CHUNK_SIZE):
+    """
+    Lazily read fixtures from an iterable of text lines in chunks of at most chunk_size.
+    """
+    fixtures = iter_csv(lines) if fmt == 'csv' else iter_ndjson(lines)
+    while True:
+        chunk = list(itertools.islice(fixtures, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def predict_chunks(chunks, probabilities=False):
+    """
+    Predict each chunk of fixtures in one batch and yield its list of result dicts.
+    Dated fixtures are predicted as of their date; rows the reader could not parse get
+    an {"error": "invalid fixture: ..."} result in their place.
+    """
+    for chunk in chunks:
+        fixtures = [fixture for fixture in chunk if not isinstance(fixture, ValueError)]
+        pairs, as_of = split_dates(fixtures)
+        if pairs:
+            if probabilities:
+                rates, _, outcomes, errors = predict_probabilities(pairs, as_of=as_of, return_errors=True)
+            else:
+                rates, errors = predict_rates(pairs, as_of, return_errors=True)
+            scores = scores_from_rates(rates, errors)
+        predicted = []
+        for i, ((home_team, away_team), (home_goals, away_goals)) in enumerate(zip(pairs, scores if pairs else [])):
+            result = {'home_team': home_team, 'away_team': away_team}
+            if as_of is not None and as_of[i] is not None:
+                result['date'] = as_of[i]
+            if isinstance(home_goals, str):
+                result['error'] = home_goals
+            else:
+                result['home_goals'] = home_goals
+                result['away_goals'] = away_goals
+                if probabilities:
+                    result.update(zip(PROBABILITY_FIELDS, (round(float(x), 4) for x in (*rates[i], *outcomes[i]))))
+            predicted.append(result)
+        if len(fixtures) == len(chunk):
+            yield predicted
+        else:
+            predicted = iter(predicted)
+            yield [{'error': str(fixture)} if isinstance(fixture, ValueError) else next(predicted) for fixture in chunk]
+
+def format_ndjson(result_chunks):
+    """
+    Yield one block of NDJSON text per chunk of results.
+    """
+    for results in result_chunks:
+        yield ''.join(json.dumps(result) + '\n' for result in results)
+
+def format_csv(result_chunks, probabilities=False, dated=False):
+    """
+    Yield the CSV header, then one block of rows per chunk of results. The header has a
+    date column if dated is set.
+    """
+    fields = CSV_FIELDS + (PROBABILITY_FIELDS if probabilities else [])
+    if dated:
+        fields.insert(2, 'date')
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fields, lineterminator='\n', extrasaction='ignore')
+    writer.writeheader()
+    yield buf.getvalue()
+    for results in result_chunks:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(results)
+        yield buf.getvalue()
+
+def stream_predictions(lines, in_format='csv', out_format=None, chunk_size=CHUNK_SIZE, probabilities=False):
+    """
+    Read fixtures from lines, predict them chunk by chunk and yield the output text. CSV
+    output has a date column if the input is a CSV whose header names one, or NDJSON
+    (whose lines may each carry a date).
+    """
+    if (out_format or in_format) != 'csv':
+        return format_ndjson(predict_chunks(read_fixtures(lines, in_format, chunk_size), probabilities))
+    dated = True
+    if in_format == 'csv':
+        # Peek at the header without consuming it
+        lines = iter(lines)
+        first = next(lines, '')
+        lines = itertools.chain([first], lines)
+        columns = csv_columns(next(csv.reader([first]), []))
+        dated = columns is not None and columns[2] is not None
+    results = predict_chunks(read_fixtures(lines, in_format, chunk_size), probabilities)
+    return format_csv(results, probabilities, dated)
+
+def guess_format(name, default='csv'):
+    """
+    'ndjson' or 'csv' from a file name or content type such as application/x-ndjson.
+    """
+    name = (name or '').lower()
+    if 'json' in name:
+        return 'ndjson'
+    if 'csv' in name:
+        return 'csv'
+    return default
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predict a CSV or NDJSON file of fixtures of any size.")
+    parser.add_argument('input', help="fixtures file, or - for stdin")
+    parser.add_argument('-o', '--output', default='-', help="output file (default: stdout)")
+    parser.add_argument('--input-format', choices=FORMATS, help="default: from the input file extension")
+    parser.add_argument('--output-format', choices=FORMATS, help="default: from the output extension, else the input format")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--probabilities', action='store_true',
+                        help="add expected goals and home/draw/away probabilities")
+    args = parser.parse_args()
+
+    in_format = args.input_format or guess_format(args.input)
+    out_format = args.output_format or (guess_format(args.output, in_format) if args.output != '-' else in_format)
+    src = text_lines(sys.stdin.buffer if args.input == '-' else open(args.input, 'rb'))
+    dst = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    start = time.perf_counter()
+    try:
+        for text in stream_predictions(src, in_format, out_format, args.chunk_size, args.probabilities):
+            dst.write(text)
+    finally:
+        if args.input != '-':
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    print(f"Done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
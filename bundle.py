@@ -0,0 +1,157 @@
+import os
+import io
+import json
+import time
+import shutil
+import hashlib
+import threading
+import numpy as np
+import xgboost as xgb
+from atomic import atomic_write_bytes
+from forest import CompiledForest
+
+# Bundles live in versioned subdirectories; CURRENT names the one being served
+BUNDLE_DIR = os.environ.get('EPL_BUNDLE_DIR', 'models')
+CURRENT_FILE = 'CURRENT'
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+
+class ArrayScaler:
+    """
+    StandardScaler.transform from plain mean/scale arrays.
+    """
+    def __init__(self, mean, scale):
+        self.mean_ = np.asarray(mean, dtype=np.float64)
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+class BoosterModel:
+    """
+    predict() on a native Booster without building a DMatrix.
+    """
+    def __init__(self, booster):
+        self.booster = booster
+
+    def predict(self, X):
+        return self.booster.inplace_predict(X)
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def save_bundle(home_booster, away_booster, scaler, teams, features, bundle_dir=BUNDLE_DIR, extra=None):
+    """
+    Write a complete model bundle and make it current. Returns the bundle version.
+
+    Boosters are stored in XGBoost's native UBJSON format, the scaler and team vocabulary
+    as plain arrays, and manifest.json records feature order and per-file sha256. The
+    bundle is assembled in a temporary directory, renamed into place under its content
+    hash and only then published by atomically replacing CURRENT.
+    """
+    files = {
+        'home_model.ubj': bytes(home_booster.save_raw('ubj')),
+        'away_model.ubj': bytes(away_booster.save_raw('ubj')),
+    }
+    buf = io.BytesIO()
+    np.savez(buf, scaler_mean=scaler.mean_, scaler_scale=scaler.scale_, teams=np.array(list(teams), dtype=str))
+    files['arrays.npz'] = buf.getvalue()
+
+    hashes = {name: sha256_bytes(data) for name, data in sorted(files.items())}
+    version = sha256_bytes(json.dumps([hashes, list(features)]).encode())[:12]
+    manifest = {
+        'format': FORMAT_VERSION,
+        'version': version,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'xgboost_version': xgb.__version__,
+        'features': list(features),
+        'n_teams': len(teams),
+        'files': hashes,
+    }
+    manifest.update(extra or {})
+
+    os.makedirs(bundle_dir, exist_ok=True)
+    final_dir = os.path.join(bundle_dir, version)
+    if not os.path.exists(final_dir):
+        tmp_dir = os.path.join(bundle_dir, f".tmp-{version}-{os.getpid()}")
+        os.makedirs(tmp_dir)
+        for name, data in files.items():
+            with open(os.path.join(tmp_dir, name), 'wb') as f:
+                f.write(data)
+        with open(os.path.join(tmp_dir, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        try:
+            os.rename(tmp_dir, final_dir)
+        except OSError:
+            # Someone else published the identical bundle first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    atomic_write_bytes(os.path.join(bundle_dir, CURRENT_FILE), version.encode())
+    return version
+
+class ModelBundle:
+    """
+    A loaded bundle. The manifest, scaler and teams are read eagerly (they are tiny); each
+    booster is only read, hash-checked and deserialized on first use.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest['version']
+        self.features = self.manifest['features']
+        with np.load(os.path.join(path, 'arrays.npz'), allow_pickle=False) as arrays:
+            self.scaler = ArrayScaler(arrays['scaler_mean'], arrays['scaler_scale'])
+            self.teams = arrays['teams'].tolist()
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, name):
+        model = self._models.get(name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(name)
+                if model is None:
+                    with open(os.path.join(self.path, name), 'rb') as f:
+                        raw = f.read()
+                    if sha256_bytes(raw) != self.manifest['files'][name]:
+                        raise ValueError(f"{name} in bundle {self.version} does not match its manifest hash")
+                    booster = xgb.Booster()
+                    booster.load_model(bytearray(raw))
+                    model = self._models[name] = BoosterModel(booster)
+        return model
+
+    def compiled(self, side):
+        """
+        CompiledForest for the 'home' or 'away' model with the scaler folded in, built on first use.
+        """
+        key = f"compiled_{side}"
+        model = self._models.get(key)
+        if model is None:
+            booster = self._model(f"{side}_model.ubj").booster
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    model = self._models[key] = CompiledForest.from_booster(booster, self.scaler)
+        return model
+
+    @property
+    def home_model(self):
+        return self._model('home_model.ubj')
+
+    @property
+    def away_model(self):
+        return self._model('away_model.ubj')
+
+def current_version(bundle_dir=BUNDLE_DIR):
+    with open(os.path.join(bundle_dir, CURRENT_FILE)) as f:
+        return f.read().strip()
+
+def load_bundle(bundle_dir=BUNDLE_DIR, version=None):
+    """
+    Open the current bundle (or a specific version) without loading the boosters yet.
+    """
+    return ModelBundle(os.path.join(bundle_dir, version or current_version(bundle_dir)))
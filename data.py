@@ -1,43 +1,173 @@
+import numpy as np
 import pandas as pd
 import requests
-from io import StringIO
-import pickle
-from sklearn.preprocessing import LabelEncoder
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from io import StringIO, BytesIO
 import os
 import gc
+import json
+import time
+import hashlib
+import argparse
+import threading
+from atomic import atomic_write_bytes
+from teams import TeamRegistry, TEAMS_FILE
+from timeline import add_timeline_features
 
 # Relevant columns to keep
 COLUMNS = ['Date', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG', 'HST', 'AST', 'HC', 'AC',
            'HF', 'AF', 'HY', 'AY', 'HR', 'AR']
 
-def download_epl_data(season):
+# Where season CSVs are fetched from; point at a local server for offline runs
+BASE_URL = os.environ.get('EPL_DATA_BASE_URL', 'https://www.football-data.co.uk/mmz4281')
+# On-disk HTTP cache of raw season files
+CACHE_DIR = os.environ.get('EPL_DATA_CACHE', os.path.join('.cache', 'seasons'))
+# Concurrent downloads (and pooled connections)
+MAX_WORKERS = 8
+
+_session = None
+_session_lock = threading.Lock()
+
+def make_session(pool_size=MAX_WORKERS, retries=3):
+    """
+    Create a requests session with a connection pool sized for pool_size threads and
+    retries with backoff on connection errors and 429/5xx responses.
+    """
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset(['GET']))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def get_session():
+    """
+    Shared, lazily created session used by all downloads in this process.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+def season_start_year(season):
+    return 2000 + int(season[:2])
+
+def current_season(today=None):
+    """
+    Season code (e.g. '2425') of the season in progress; seasons roll over in July.
+    """
+    today = today or date.today()
+    year = today.year if today.month >= 7 else today.year - 1
+    return f"{year % 100:02d}{(year + 1) % 100:02d}"
+
+def all_seasons():
+    """
+    Season codes from 2000-01 up to the season in progress.
+    """
+    return [f"{str(y)[-2:]}{str(y+1)[-2:]}" for y in range(2000, season_start_year(current_season()) + 1)]
+
+def fetch_season_csv(season, session=None, base_url=None, cache_dir=None, revalidate=None):
+    """
+    Return the raw CSV text for a season, going through the on-disk cache.
+
+    A season never changes once it has ended, so a copy fetched after its end is used
+    without touching the network. The current season, any season cached while it was
+    still in progress (or without that record) and any season with revalidate=True are
+    revalidated with If-None-Match / If-Modified-Since and only re-downloaded when they
+    changed.
+    """
+    session = session or get_session()
+    base_url = (base_url or BASE_URL).rstrip('/')
+    cache_dir = cache_dir or CACHE_DIR
+    data_path = os.path.join(cache_dir, f"{season}.csv")
+    meta_path = os.path.join(cache_dir, f"{season}.json")
+
+    meta = None
+    if os.path.exists(data_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    # Whether the season is over now, i.e. a copy fetched from here on is final
+    ended = season_start_year(season) < season_start_year(current_season())
+    if revalidate is None:
+        revalidate = not ended or meta is None or not meta.get('complete', False)
+    if meta is not None and not revalidate:
+        with open(data_path, 'rb') as f:
+            return f.read().decode(meta['encoding'])
+
+    headers = {}
+    if meta is not None:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+    response = session.get(f"{base_url}/{season}/E0.csv", headers=headers, timeout=30)
+    if response.status_code == 304 and meta is not None:
+        if ended and not meta.get('complete', False):
+            # Unchanged since the season ended: the cached copy is final
+            meta.update(fetched_at=time.time(), complete=True)
+            atomic_write_bytes(meta_path, json.dumps(meta).encode())
+        with open(data_path, 'rb') as f:
+            return f.read().decode(meta['encoding'])
+    response.raise_for_status()
+
+    encoding = response.encoding or response.apparent_encoding or 'utf-8'
+    os.makedirs(cache_dir, exist_ok=True)
+    atomic_write_bytes(data_path, response.content)
+    atomic_write_bytes(meta_path, json.dumps({
+        'url': response.url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'encoding': encoding,
+        'fetched_at': time.time(),
+        'complete': ended,
+    }).encode())
+    return response.content.decode(encoding)
+
+def download_epl_data(season, session=None, base_url=None, cache_dir=None):
     """
     Download EPL match data for a single season from football-data.co.uk.
     Handles malformed CSVs safely.
     """
-    url = f"https://www.football-data.co.uk/mmz4281/{season}/E0.csv"
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        df = pd.read_csv(StringIO(response.text), usecols=lambda c: c in COLUMNS, on_bad_lines='skip')
+        text = fetch_season_csv(season, session=session, base_url=base_url, cache_dir=cache_dir)
+    except Exception as e:
+        print(f"Failed to download {season}: {e}")
+        return pd.DataFrame()
+    return parse_season_csv(text, season)
+
+def parse_season_csv(text, season):
+    """
+    Parse a raw season CSV into the relevant COLUMNS, skipping malformed lines.
+    """
+    try:
+        df = pd.read_csv(StringIO(text), usecols=lambda c: c in COLUMNS, on_bad_lines='skip')
         df['Season'] = season
         return df
     except Exception as e:
-        print(f"Failed to download {season}: {e}")
+        print(f"Failed to parse {season}: {e}")
         return pd.DataFrame()
 
-def preprocess_data(df):
+def preprocess_data(df, teams=None):
     """
-    Preprocess a single season DataFrame.
+    Preprocess a single season DataFrame. Teams are encoded with the given TeamRegistry
+    (a fresh one if None), registering teams it has not seen yet.
     """
     df = df.copy().dropna()
     df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y', errors='coerce')
     df = df.sort_values('Date').reset_index(drop=True)
 
-    # Encode teams
-    le = LabelEncoder()
-    df['HomeTeam_encoded'] = le.fit_transform(df['HomeTeam'])
-    df['AwayTeam_encoded'] = le.transform(df['AwayTeam'])
+    # Encode teams with stable ids
+    if teams is None:
+        teams = TeamRegistry()
+    teams.add(pd.concat([df['HomeTeam'], df['AwayTeam']]).unique())
+    df['HomeTeam_encoded'] = teams.encode(df['HomeTeam'])
+    df['AwayTeam_encoded'] = teams.encode(df['AwayTeam'])
 
     # Add features
     df = add_team_features(df)
@@ -50,24 +180,40 @@ def preprocess_data(df):
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], downcast='float')
 
-    return df, le
+    return df, teams
+
+def grouped_rolling_mean(df, key, columns, window=5):
+    """
+    Rolling mean of several columns within each group of key, in one grouped pass.
+    Returns an array aligned with the rows of df.
+    """
+    rolled = df.groupby(key, sort=False)[columns].rolling(window, min_periods=1).mean()
+    # Rows come back grouped; the second index level holds each row's original position
+    out = np.full((len(df), len(columns)), np.nan)
+    out[rolled.index.get_level_values(1)] = rolled.to_numpy(dtype=float)
+    return out
 
 def add_team_features(df):
     """
-    Add rolling averages, form, strength, and interaction features using transform for memory efficiency.
+    Add rolling averages, form, strength, and interaction features with vectorized operations.
     """
     # Points
-    df['HomePoints'] = df.apply(lambda x: 3 if x['FTHG'] > x['FTAG'] else 1 if x['FTHG'] == x['FTAG'] else 0, axis=1)
-    df['AwayPoints'] = df.apply(lambda x: 3 if x['FTAG'] > x['FTHG'] else 1 if x['FTAG'] == x['FTHG'] else 0, axis=1)
+    fthg = df['FTHG'].to_numpy()
+    ftag = df['FTAG'].to_numpy()
+    df['HomePoints'] = np.where(fthg > ftag, 3, np.where(fthg == ftag, 1, 0))
+    df['AwayPoints'] = np.where(ftag > fthg, 3, np.where(ftag == fthg, 1, 0))
 
-    # Rolling stats per team using transform
-    df['HomeRollingGF'] = df.groupby('HomeTeam')['FTHG'].transform(lambda x: x.rolling(5, min_periods=1).mean())
-    df['HomeRollingGA'] = df.groupby('HomeTeam')['FTAG'].transform(lambda x: x.rolling(5, min_periods=1).mean())
-    df['HomeForm'] = df.groupby('HomeTeam')['HomePoints'].transform(lambda x: x.rolling(5, min_periods=1).mean())
+    # Rolling stats per team: one grouped pass per side
+    positions = df.reset_index(drop=True)
+    home = grouped_rolling_mean(positions, 'HomeTeam', ['FTHG', 'FTAG', 'HomePoints'])
+    df['HomeRollingGF'] = home[:, 0]
+    df['HomeRollingGA'] = home[:, 1]
+    df['HomeForm'] = home[:, 2]
 
-    df['AwayRollingGF'] = df.groupby('AwayTeam')['FTAG'].transform(lambda x: x.rolling(5, min_periods=1).mean())
-    df['AwayRollingGA'] = df.groupby('AwayTeam')['FTHG'].transform(lambda x: x.rolling(5, min_periods=1).mean())
-    df['AwayForm'] = df.groupby('AwayTeam')['AwayPoints'].transform(lambda x: x.rolling(5, min_periods=1).mean())
+    away = grouped_rolling_mean(positions, 'AwayTeam', ['FTAG', 'FTHG', 'AwayPoints'])
+    df['AwayRollingGF'] = away[:, 0]
+    df['AwayRollingGA'] = away[:, 1]
+    df['AwayForm'] = away[:, 2]
 
     # Fill missing values
     df['HomeRollingGF'] = df['HomeRollingGF'].fillna(df['FTHG'].mean())
@@ -89,40 +235,151 @@ def add_team_features(df):
 
     return df
 
-if __name__ == "__main__":
-    seasons = [f"{str(y)[-2:]}{str(y+1)[-2:]}" for y in range(2000, 2025)]
-    csv_file = 'epl_data.csv'
-    label_file = 'label_encoder.pkl'
+# Processed dataset: typed, columnar Parquet (CSV is an optional export)
+DATA_FILE = 'epl_data.parquet'
+CSV_FILE = 'epl_data.csv'
+TEAM_COLUMNS = ['HomeTeam', 'AwayTeam']
 
-    # Remove old files to start fresh
-    if os.path.exists(csv_file):
-        os.remove(csv_file)
+def write_parquet(df, path):
+    """
+    Write df to a Parquet file atomically.
+    """
+    buf = BytesIO()
+    df.to_parquet(buf, index=False)
+    atomic_write_bytes(path, buf.getvalue())
 
-    for season in seasons:
-        print(f"Processing season {season}...")
-        df_season = download_epl_data(season)
-        if df_season.empty:
+def load_dataset(columns=None, path=DATA_FILE):
+    """
+    Load the processed dataset, optionally only the given columns, memory-mapping the file.
+    Numeric columns keep their stored float32 dtypes and team columns are categorical.
+    """
+    return pd.read_parquet(path, columns=columns, memory_map=True)
+
+# Incremental builds keep processed per-season partitions and a manifest describing them
+PARTITION_DIR = os.path.join('data', 'partitions')
+MANIFEST_FILE = os.path.join('data', 'manifest.json')
+# Bumped when partitions change meaning; older manifests force a full rebuild
+MANIFEST_FORMAT = 3
+
+def partition_team_ids(df):
+    """The {team: id} encoding a preprocessed season partition was written with."""
+    pairs = pd.concat([
+        df[['HomeTeam', 'HomeTeam_encoded']].set_axis(['team', 'id'], axis=1),
+        df[['AwayTeam', 'AwayTeam_encoded']].set_axis(['team', 'id'], axis=1),
+    ]).drop_duplicates()
+    return {str(team): int(team_id) for team, team_id in sorted(zip(pairs['team'], pairs['id']))}
+
+def load_manifest(path=MANIFEST_FILE):
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get('format') == MANIFEST_FORMAT:
+            return manifest
+    return {'format': MANIFEST_FORMAT, 'seasons': {}}
+
+def build_dataset(seasons, data_file=DATA_FILE, incremental=False, partition_dir=PARTITION_DIR,
+                  manifest_file=MANIFEST_FILE, max_workers=MAX_WORKERS, csv_file=None, teams_file=TEAMS_FILE,
+                  timeline=False):
+    """
+    Build data_file from per-season partitions and return all teams in id order.
+
+    Each season's raw source is hashed. In incremental mode a season is only re-featured
+    when its hash differs from the manifest or its partition is missing; otherwise the
+    stored partition is reused. Seasons are encoded in order against the persistent
+    TeamRegistry, so team ids never change between builds; a partition whose stored
+    {team: id} map no longer matches the registry is rebuilt. Partitions, the dataset, the
+    registry and the manifest are all replaced atomically. If csv_file is given, the
+    dataset is also exported there as CSV. With timeline=True the stitched dataset also
+    gets the cross-season timeline features from timeline.add_timeline_features.
+    """
+    manifest = load_manifest(manifest_file) if incremental else {'format': MANIFEST_FORMAT, 'seasons': {}}
+    teams = TeamRegistry.load(teams_file)
+    os.makedirs(partition_dir, exist_ok=True)
+
+    def fetch(season):
+        try:
+            return fetch_season_csv(season, session=get_session())
+        except Exception as e:
+            print(f"Failed to download {season}: {e}")
+            return None
+
+    print(f"Fetching {len(seasons)} seasons...")
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        sources = list(pool.map(fetch, seasons))
+
+    built = []
+    for season, text in zip(seasons, sources):
+        partition = os.path.join(partition_dir, f"{season}.parquet")
+        entry = manifest['seasons'].get(season)
+        have_partition = entry is not None and os.path.exists(partition)
+        # A partition is only valid if it was encoded with the registry's current ids
+        ids_match = have_partition and all(teams.ids.get(team) == team_id
+                                           for team, team_id in entry['team_ids'].items())
+        if text is None:
+            # Keep the last good build of a season we could not fetch
+            if ids_match:
+                built.append(season)
+            elif have_partition:
+                print(f"Dropping season {season}: its team ids are stale and it cannot be rebuilt")
             continue
-        df_season, le = preprocess_data(df_season)
 
-        # Append season to CSV
-        df_season.to_csv(csv_file, mode='a', index=False, header=not os.path.exists(csv_file))
+        source_hash = hashlib.sha256(text.encode()).hexdigest()
+        if ids_match and entry['source_sha256'] == source_hash:
+            built.append(season)
+            continue
 
-        # Save LabelEncoder (overwrite each time is fine)
-        with open(label_file, 'wb') as f:
-            pickle.dump(le, f)
+        print(f"Processing season {season}...")
+        start = time.perf_counter()
+        df_season = parse_season_csv(text, season)
+        if df_season.empty:
+            continue
+        df_season, _ = preprocess_data(df_season, teams)
+        write_parquet(df_season, partition)
+        manifest['seasons'][season] = {
+            'source_sha256': source_hash,
+            'rows': len(df_season),
+            'team_ids': partition_team_ids(df_season),
+            'processing_seconds': round(time.perf_counter() - start, 3),
+        }
+        built.append(season)
 
         # Clean up memory
         del df_season
         gc.collect()
 
-    print("All seasons processed successfully. Dataset is ready!")
+    manifest['seasons'] = {season: manifest['seasons'][season] for season in built}
+    teams.save(teams_file)
+
+    # Stitch the typed partitions together; team names become one shared categorical whose
+    # codes are the registry ids
+    df_all = pd.concat([pd.read_parquet(os.path.join(partition_dir, f"{season}.parquet")) for season in built],
+                       ignore_index=True)
+    for col in TEAM_COLUMNS:
+        df_all[col] = df_all[col].astype(teams.dtype())
+    df_all['Season'] = df_all['Season'].astype('category')
+    if timeline:
+        # Form that carries across seasons has to be computed on the stitched dataset
+        df_all = add_timeline_features(df_all)
+    write_parquet(df_all, data_file)
+
+    if csv_file:
+        tmp_file = f"{csv_file}.tmp-{os.getpid()}"
+        df_all.to_csv(tmp_file, index=False)
+        os.replace(tmp_file, csv_file)
+
+    atomic_write_bytes(manifest_file, json.dumps(manifest, indent=2).encode())
+    return list(teams.teams)
 
-    # Fit label encoder on all teams from the dataset
-    df_all = pd.read_csv(csv_file)
-    all_teams = pd.concat([df_all['HomeTeam'], df_all['AwayTeam']]).unique()
-    le = LabelEncoder()
-    le.fit(all_teams)
-    with open(label_file, 'wb') as f:
-        pickle.dump(le, f)
-    print(f"Label encoder updated with {len(le.classes_)} teams.")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Download and preprocess EPL seasons into {DATA_FILE}.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only reprocess seasons whose source changed since the last build")
+    parser.add_argument('--csv', action='store_true', help=f"also export the dataset to {CSV_FILE}")
+    parser.add_argument('--timeline', action='store_true',
+                        help="add cross-season rolling and EWMA form columns (see timeline.py)")
+    args = parser.parse_args()
+
+    all_teams = build_dataset(all_seasons(), incremental=args.incremental, csv_file=CSV_FILE if args.csv else None,
+                              timeline=args.timeline)
+    print("All seasons processed successfully. Dataset is ready!")
+    print(f"Team registry {TEAMS_FILE} has {len(all_teams)} teams.")
@@ -1,18 +1,28 @@
-import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-import pickle
+import os
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.preprocessing import StandardScaler
+from data import load_dataset
+from bundle import load_bundle
+from features import FEATURES
+from model import BASE_PARAMS, NUM_BOOST_ROUND
 
 def evaluate_models():
+    # Load the current model bundle (models, scaler and feature order)
+    bundle = load_bundle()
+
     # Load data
-    df = pd.read_csv('epl_data.csv')
+    df = load_dataset(bundle.features + ['FTHG', 'FTAG'])
 
     # Prepare features
-    features = ['HomeTeam_encoded', 'AwayTeam_encoded', 'HST', 'AST', 'HC', 'AC', 'HF', 'AF', 'HY', 'AY', 'HR', 'AR',
-                'HomeRollingGF', 'HomeRollingGA', 'AwayRollingGF', 'AwayRollingGA', 'HomeForm', 'AwayForm',
-                'HomeStrength', 'AwayStrength', 'FormInteraction', 'StrengthInteraction']
-    X = df[features]
+    X = df[bundle.features]
     y_home = df['FTHG']
     y_away = df['FTAG']
 
@@ -21,20 +31,12 @@ def evaluate_models():
         X, y_home, y_away, test_size=0.2, random_state=42
     )
 
-    # Load models and scaler
-    with open('home_model.pkl', 'rb') as f:
-        home_model = pickle.load(f)
-    with open('away_model.pkl', 'rb') as f:
-        away_model = pickle.load(f)
-    with open('scaler.pkl', 'rb') as f:
-        scaler = pickle.load(f)
-
     # Scale test features
-    X_test_scaled = scaler.transform(X_test)
+    X_test_scaled = bundle.scaler.transform(X_test)
 
     # Predict on test set
-    home_pred = home_model.predict(X_test_scaled)
-    away_pred = away_model.predict(X_test_scaled)
+    home_pred = bundle.home_model.predict(X_test_scaled)
+    away_pred = bundle.away_model.predict(X_test_scaled)
 
     # Calculate metrics for home goals
     print("Home Goals Evaluation:")
@@ -47,28 +49,110 @@ def evaluate_models():
     print(f"MAE: {mean_absolute_error(y_away_test, away_pred):.4f}")
     print(f"R²: {r2_score(y_away_test, away_pred):.4f}")
 
-    # Overall accuracy (exact score prediction)
-    exact_matches = 0
-    total = len(y_home_test)
-    for i in range(total):
-        pred_home = round(home_pred[i])
-        pred_away = round(away_pred[i])
-        actual_home = y_home_test.iloc[i]
-        actual_away = y_away_test.iloc[i]
-        if pred_home == actual_home and pred_away == actual_away:
-            exact_matches += 1
-
-    print(f"\nExact Score Accuracy: {exact_matches}/{total} ({exact_matches/total*100:.2f}%)")
-
-    # Goal difference accuracy
-    gd_matches = 0
-    for i in range(total):
-        pred_gd = round(home_pred[i]) - round(away_pred[i])
-        actual_gd = y_home_test.iloc[i] - y_away_test.iloc[i]
-        if pred_gd == actual_gd:
-            gd_matches += 1
-
-    print(f"Goal Difference Accuracy: {gd_matches}/{total} ({gd_matches/total*100:.2f}%)")
+    # Overall accuracy (exact score prediction) and goal difference accuracy
+    scores = score_metrics(y_home_test, y_away_test, home_pred, away_pred)
+    total = scores['matches']
+    print(f"\nExact Score Accuracy: {scores['exact']}/{total} ({scores['exact_accuracy']*100:.2f}%)")
+    print(f"Goal Difference Accuracy: {scores['goal_diff']}/{total} ({scores['goal_diff_accuracy']*100:.2f}%)")
+
+def score_metrics(y_home, y_away, home_pred, away_pred):
+    """
+    Vectorized goal and scoreline metrics for one set of predictions.
+    """
+    y_home = np.asarray(y_home, dtype=np.float64)
+    y_away = np.asarray(y_away, dtype=np.float64)
+    home_pred = np.asarray(home_pred, dtype=np.float64)
+    away_pred = np.asarray(away_pred, dtype=np.float64)
+    # np.round rounds halves to even, like the built-in round()
+    round_home = np.round(home_pred)
+    round_away = np.round(away_pred)
+    exact = (round_home == y_home) & (round_away == y_away)
+    goal_diff = (round_home - round_away) == (y_home - y_away)
+    outcome = np.sign(round_home - round_away) == np.sign(y_home - y_away)
+    total = len(y_home)
+    return {
+        'matches': total,
+        'home_mse': float(np.mean((home_pred - y_home) ** 2)),
+        'away_mse': float(np.mean((away_pred - y_away) ** 2)),
+        'home_mae': float(np.mean(np.abs(home_pred - y_home))),
+        'away_mae': float(np.mean(np.abs(away_pred - y_away))),
+        'exact': int(exact.sum()),
+        'goal_diff': int(goal_diff.sum()),
+        'exact_accuracy': float(exact.mean()) if total else 0.0,
+        'goal_diff_accuracy': float(goal_diff.mean()) if total else 0.0,
+        'outcome_accuracy': float(outcome.mean()) if total else 0.0,
+    }
+
+_fold_data = None
+
+def _init_fold_worker(data):
+    global _fold_data
+    _fold_data = data
+
+def _run_fold(args):
+    """
+    Train on every season before test_idx and score season test_idx (runs in a pool worker).
+    """
+    test_idx, params, num_boost_round, nthread = args
+    X, y_home, y_away, season_idx, seasons = _fold_data
+    train = season_idx < test_idx
+    test = season_idx == test_idx
+
+    start = time.perf_counter()
+    scaler = StandardScaler().fit(X[train])
+    X_train = scaler.transform(X[train])
+    X_test = scaler.transform(X[test])
+    params = dict(params, nthread=nthread)
+    dtrain_home = xgb.QuantileDMatrix(X_train, label=y_home[train], nthread=nthread)
+    dtrain_away = xgb.QuantileDMatrix(X_train, label=y_away[train], ref=dtrain_home, nthread=nthread)
+    home_pred = xgb.train(params, dtrain_home, num_boost_round).inplace_predict(X_test)
+    away_pred = xgb.train(params, dtrain_away, num_boost_round).inplace_predict(X_test)
+
+    row = {'season': seasons[test_idx], 'train_seasons': int(test_idx), 'train_matches': int(train.sum())}
+    row.update(score_metrics(y_home[test], y_away[test], home_pred, away_pred))
+    row['seconds'] = round(time.perf_counter() - start, 3)
+    return row
+
+def backtest(df=None, min_train_seasons=5, n_jobs=None, params=BASE_PARAMS, num_boost_round=NUM_BOOST_ROUND):
+    """
+    Walk-forward backtest: for every season S after the first min_train_seasons, train on
+    all seasons before S and test on S. The feature matrix is built once and handed to
+    each pool worker at start-up; folds run in parallel and return a per-season metrics table.
+    """
+    if df is None:
+        df = load_dataset(FEATURES + ['FTHG', 'FTAG', 'Season'])
+    season_labels = df['Season'].astype(str).to_numpy()
+    seasons = list(pd.unique(season_labels))
+    season_idx = pd.Categorical(season_labels, categories=seasons).codes
+    data = (df[FEATURES].to_numpy(dtype=np.float64), df['FTHG'].to_numpy(dtype=np.float64),
+            df['FTAG'].to_numpy(dtype=np.float64), season_idx, seasons)
+
+    cores = os.cpu_count() or 1
+    folds = list(range(min_train_seasons, len(seasons)))
+    n_jobs = min(n_jobs or cores, max(1, len(folds)))
+    nthread = max(1, cores // n_jobs)
+    tasks = [(i, params, num_boost_round, nthread) for i in folds]
+    # spawn, not fork: forking a process that may hold OpenMP threads can deadlock
+    with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_fold_worker, initargs=(data,)) as pool:
+        rows = list(pool.map(_run_fold, tasks))
+    return pd.DataFrame(rows)
 
 if __name__ == "__main__":
-    evaluate_models()
+    parser = argparse.ArgumentParser(description="Evaluate the trained models.")
+    parser.add_argument('--backtest', action='store_true', help="walk-forward backtest over all seasons")
+    parser.add_argument('--min-train-seasons', type=int, default=5)
+    parser.add_argument('--jobs', type=int, default=None, help="parallel folds (default: all cores)")
+    parser.add_argument('--out', help="write the per-season metrics table to this CSV file")
+    args = parser.parse_args()
+
+    if args.backtest:
+        start = time.perf_counter()
+        results = backtest(min_train_seasons=args.min_train_seasons, n_jobs=args.jobs)
+        with pd.option_context('display.width', 200, 'display.max_columns', None):
+            print(results.round(4).to_string(index=False))
+        print(f"\n{len(results)} folds in {time.perf_counter() - start:.1f}s")
+        if args.out:
+            results.to_csv(args.out, index=False)
+    else:
+        evaluate_models()
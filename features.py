@@ -0,0 +1,233 @@
+import numpy as np
+
+# Model input columns, in the order the models were trained on
+FEATURES = ['HomeTeam_encoded', 'AwayTeam_encoded', 'HST', 'AST', 'HC', 'AC', 'HF', 'AF', 'HY', 'AY', 'HR', 'AR',
+            'HomeRollingGF', 'HomeRollingGA', 'AwayRollingGF', 'AwayRollingGA', 'HomeForm', 'AwayForm',
+            'HomeStrength', 'AwayStrength', 'FormInteraction', 'StrengthInteraction']
+
+# Per-side state taken from a team's latest home / away row
+HOME_STATE = ['HST', 'HC', 'HF', 'HY', 'HR', 'HomeRollingGF', 'HomeRollingGA', 'HomeForm', 'HomeStrength']
+AWAY_STATE = ['AST', 'AC', 'AF', 'AY', 'AR', 'AwayRollingGF', 'AwayRollingGA', 'AwayForm', 'AwayStrength']
+
+# Dataset columns TeamIndex and FeatureStore need
+INDEX_COLUMNS = ['Date', 'Season', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG'] + HOME_STATE + AWAY_STATE
+
+class TeamIndex:
+    """
+    Latest home and away state of every team, keyed by encoded team id.
+
+    Built once per loaded dataset so that feature assembly is two row gathers instead of
+    scanning and sorting the whole DataFrame per prediction.
+    """
+    def __init__(self, df, teams):
+        classes = list(teams)
+        self.team_ids = {team: i for i, team in enumerate(classes)}
+        n = len(classes)
+
+        self.home = np.zeros((n, len(HOME_STATE)))
+        self.away = np.zeros((n, len(AWAY_STATE)))
+        self.has_home = np.zeros(n, dtype=bool)
+        self.has_away = np.zeros(n, dtype=bool)
+
+        ordered = df.sort_values('Date', kind='stable')
+        latest_home = ordered.groupby('HomeTeam', sort=False, observed=True).tail(1)
+        latest_away = ordered.groupby('AwayTeam', sort=False, observed=True).tail(1)
+        for team, row in zip(latest_home['HomeTeam'], latest_home[HOME_STATE].to_numpy(dtype=float)):
+            if team in self.team_ids:
+                self.home[self.team_ids[team]] = row
+                self.has_home[self.team_ids[team]] = True
+        for team, row in zip(latest_away['AwayTeam'], latest_away[AWAY_STATE].to_numpy(dtype=float)):
+            if team in self.team_ids:
+                self.away[self.team_ids[team]] = row
+                self.has_away[self.team_ids[team]] = True
+
+        # League averages used when either team has no history on its side
+        self.home_fallback = np.array(list(df[['HST', 'HC', 'HF', 'HY', 'HR']].mean()) +
+                                      [df['FTHG'].mean(), df['FTAG'].mean(), 1.5, 0.0])
+        self.away_fallback = np.array(list(df[['AST', 'AC', 'AF', 'AY', 'AR']].mean()) +
+                                      [df['FTAG'].mean(), df['FTHG'].mean(), 1.5, 0.0])
+
+    def encode(self, team):
+        """
+        Encoded id of a team; raises ValueError for unknown teams like LabelEncoder.transform.
+        """
+        try:
+            return self.team_ids[team]
+        except (KeyError, TypeError):
+            raise ValueError(f"Unknown team: {team}")
+
+    def assemble(self, home_ids, away_ids):
+        """
+        Build the (n, len(FEATURES)) raw feature matrix for arrays of encoded home and away ids.
+        """
+        home_ids = np.asarray(home_ids, dtype=np.intp)
+        away_ids = np.asarray(away_ids, dtype=np.intp)
+        known = (self.has_home[home_ids] & self.has_away[away_ids])[:, None]
+        h = np.where(known, self.home[home_ids], self.home_fallback)
+        a = np.where(known, self.away[away_ids], self.away_fallback)
+        return build_features(home_ids, away_ids, h, a)
+
+def build_features(home_ids, away_ids, h, a):
+    """
+    Lay out (n, len(FEATURES)) model inputs from encoded ids and the HOME_STATE / AWAY_STATE
+    rows of each fixture's home and away team.
+    """
+    X = np.empty((len(home_ids), len(FEATURES)))
+    X[:, 0] = home_ids
+    X[:, 1] = away_ids
+    X[:, 2:12:2] = h[:, :5]
+    X[:, 3:12:2] = a[:, :5]
+    X[:, 12:14] = h[:, 5:7]
+    X[:, 14:16] = a[:, 5:7]
+    X[:, 16] = h[:, 7]
+    X[:, 17] = a[:, 7]
+    X[:, 18] = h[:, 8]
+    X[:, 19] = a[:, 8]
+    X[:, 20] = h[:, 7] * a[:, 7]
+    X[:, 21] = h[:, 8] * a[:, 8]
+    return X
+
+def to_days(dates):
+    """
+    Dates (strings, datetimes or datetime64) as int64 days since the epoch.
+    """
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+class TeamTimeline:
+    """
+    Every state row of one side (home or away) of all teams, sorted by (team id, date).
+
+    Rows are addressed by one int64 key per row, team id in the high 32 bits and day in the
+    low 32 bits, so a point-in-time lookup for any number of (team, date) pairs is a single
+    np.searchsorted over the sorted keys.
+    """
+    def __init__(self, team_ids, days, state):
+        keys = self.key(team_ids, days)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.team_ids = np.asarray(team_ids, dtype=np.int64)[order]
+        self.days = np.asarray(days, dtype=np.int64)[order]
+        self.state = np.asarray(state, dtype=float)[order]
+
+    @staticmethod
+    def key(team_ids, days):
+        return (np.asarray(team_ids, dtype=np.int64) << 32) + np.asarray(days, dtype=np.int64) + (1 << 31)
+
+    def rows_before(self, team_ids, days):
+        """
+        Position of each team's latest row strictly before the given day, and a mask of the
+        pairs that have one.
+        """
+        team_ids = np.asarray(team_ids, dtype=np.int64)
+        rows = np.searchsorted(self.keys, self.key(team_ids, days), side='left') - 1
+        clipped = np.maximum(rows, 0)
+        found = (rows >= 0) & (self.team_ids[clipped] == team_ids) if len(self.keys) else np.zeros(len(rows), bool)
+        return clipped, found
+
+def running_mean(team_ids, seasons, days, values):
+    """
+    Mean of values over each row's (team, season) group up to and including the row, in
+    date order (dataset order within a day). A timeline row read through rows_before is
+    therefore the one-row-shifted mean over the matches strictly before the as-of date.
+    """
+    n = len(values)
+    order = np.lexsort((days, seasons, team_ids))
+    groups = np.column_stack([team_ids, seasons])[order]
+    index = np.arange(n)
+    first = np.r_[True, (groups[1:] != groups[:-1]).any(axis=1)] if n else np.zeros(0, dtype=bool)
+    start = np.maximum.accumulate(np.where(first, index, 0)) if n else index
+    csum = np.concatenate([[0.0], np.cumsum(values[order])])
+    out = np.empty(n)
+    out[order] = (csum[index + 1] - csum[start]) / (index - start + 1)
+    return out
+
+class FeatureStore:
+    """
+    Point-in-time home and away state of every team, for predicting fixtures as they would
+    have looked on a given day.
+
+    Built from the rows add_team_features produced: each team's rolling goals for/against
+    and form after every match it played, kept as sorted timelines. The dataset's strength
+    columns are whole-season means, so strength is recomputed here as the running mean goal
+    difference of the team's matches on that side so far in the season. The state of a
+    team as of a date is its latest row from a match strictly before that date, so a
+    fixture never sees its own or any later result. League averages are taken over the
+    same past.
+    """
+    def __init__(self, df, teams):
+        classes = list(teams)
+        self.team_ids = {team: i for i, team in enumerate(classes)}
+        days = to_days(df['Date'].to_numpy())
+        # Strength restarts every season, as in add_team_features
+        seasons = (np.unique(df['Season'].astype(str).to_numpy(), return_inverse=True)[1] if 'Season' in df
+                   else np.zeros(len(df), dtype=np.int64))
+        margin = df['FTHG'].to_numpy(dtype=float) - df['FTAG'].to_numpy(dtype=float)
+        home = df['HomeTeam'].map(self.team_ids).to_numpy(dtype=float)
+        away = df['AwayTeam'].map(self.team_ids).to_numpy(dtype=float)
+        has_home, has_away = ~np.isnan(home), ~np.isnan(away)
+        home_state = np.array(df[HOME_STATE], dtype=float)
+        away_state = np.array(df[AWAY_STATE], dtype=float)
+        home_state[:, -1] = running_mean(home, seasons, days, margin)
+        away_state[:, -1] = running_mean(away, seasons, days, -margin)
+        self.home = TeamTimeline(home[has_home], days[has_home], home_state[has_home])
+        self.away = TeamTimeline(away[has_away], days[has_away], away_state[has_away])
+
+        # Running league averages: row i of the sums covers the first i matches by date
+        order = np.argsort(days, kind='stable')
+        self.days = days[order]
+        totals = df[['HST', 'HC', 'HF', 'HY', 'HR', 'AST', 'AC', 'AF', 'AY', 'AR', 'FTHG', 'FTAG']].to_numpy(dtype=float)[order]
+        self.sums = np.vstack([np.zeros(totals.shape[1]), np.cumsum(totals, axis=0)])
+
+    def encode(self, team):
+        """
+        Encoded id of a team; raises ValueError for unknown teams.
+        """
+        try:
+            return self.team_ids[team]
+        except (KeyError, TypeError):
+            raise ValueError(f"Unknown team: {team}")
+
+    def state(self, team, date, side='home'):
+        """
+        HOME_STATE (or AWAY_STATE) values of one team as of date, or None if it had not
+        played on that side before then.
+        """
+        timeline = self.home if side == 'home' else self.away
+        rows, found = timeline.rows_before([self.encode(team)], [to_days(date)])
+        return timeline.state[rows[0]] if found[0] else None
+
+    def history(self, home_ids, away_ids, dates):
+        """
+        Mask of the fixtures where at least one team played on its side before the date.
+        """
+        days = np.broadcast_to(to_days(dates), np.shape(home_ids))
+        return self.home.rows_before(home_ids, days)[1] | self.away.rows_before(away_ids, days)[1]
+
+    def fallbacks(self, days):
+        """
+        League-average home and away state rows over the matches before each day; NaN
+        before the first match.
+        """
+        n = np.searchsorted(self.days, days, side='left')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = self.sums[n] / n[:, None]
+        home = np.column_stack([means[:, 0:5], means[:, 10], means[:, 11], np.full(len(n), 1.5), np.zeros(len(n))])
+        away = np.column_stack([means[:, 5:10], means[:, 11], means[:, 10], np.full(len(n), 1.5), np.zeros(len(n))])
+        return home, away
+
+    def assemble(self, home_ids, away_ids, dates):
+        """
+        Raw feature matrix for arrays of encoded home and away ids, each fixture built from
+        both teams' state as of its date (a scalar date applies to all fixtures). As in
+        TeamIndex, league averages stand in when either team has no history on its side.
+        """
+        home_ids = np.asarray(home_ids, dtype=np.intp)
+        away_ids = np.asarray(away_ids, dtype=np.intp)
+        days = np.broadcast_to(to_days(dates), home_ids.shape)
+        home_rows, home_found = self.home.rows_before(home_ids, days)
+        away_rows, away_found = self.away.rows_before(away_ids, days)
+        known = (home_found & away_found)[:, None]
+        home_fallback, away_fallback = self.fallbacks(days)
+        h = np.where(known, self.home.state[home_rows], home_fallback)
+        a = np.where(known, self.away.state[away_rows], away_fallback)
+        return build_features(home_ids, away_ids, h, a)
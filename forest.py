@@ -0,0 +1,147 @@
+import json
+import numpy as np
+
+# Output transforms of the objectives we can evaluate, applied to the float32 margin
+TRANSFORMS = {
+    # exp in float64 then rounded, matching the correctly rounded expf XGBoost uses
+    'count:poisson': lambda margin: np.exp(margin.astype(np.float64)).astype(np.float32),
+    'reg:squarederror': lambda margin: margin,
+    'reg:absoluteerror': lambda margin: margin,
+}
+# Objectives whose base_score is stored on the output scale and must be mapped to a margin
+LOG_LINK = {'count:poisson'}
+
+def fold_thresholds(thresholds, mean, scale):
+    """
+    Map float32 split thresholds on scaled features back to raw feature values.
+
+    XGBoost goes left when float32((x - mean) / scale) < t. That predicate is monotone in
+    x, so there is a raw float64 boundary b with: goes left <=> x < b. It is found by
+    bisection over all splits at once, so the folded comparison makes exactly the same
+    decisions as scaling first, including values that land exactly on a threshold.
+    """
+    t = np.asarray(thresholds, dtype=np.float32)
+    mean = np.asarray(mean, dtype=np.float64)
+    scale = np.asarray(scale, dtype=np.float64)
+
+    def goes_left(x):
+        return ((x - mean) / scale).astype(np.float32) < t
+
+    guess = t.astype(np.float64) * scale + mean
+    width = np.abs(guess) * 1e-6 + scale * 1e-6 + 1e-12
+    lo, hi = guess - width, guess + width
+    for _ in range(200):
+        bad_lo = ~goes_left(lo)
+        bad_hi = goes_left(hi)
+        if not (bad_lo.any() or bad_hi.any()):
+            break
+        width = np.where(bad_lo | bad_hi, width * 2, width)
+        lo = np.where(bad_lo, guess - width, lo)
+        hi = np.where(bad_hi, guess + width, hi)
+    else:
+        raise ValueError("could not bracket split thresholds")
+
+    # Invariant: goes_left(lo) and not goes_left(hi); shrink until they are adjacent floats
+    for _ in range(2100):
+        mid = lo + (hi - lo) / 2
+        active = (mid > lo) & (mid < hi)
+        if not active.any():
+            break
+        left = goes_left(mid)
+        lo = np.where(active & left, mid, lo)
+        hi = np.where(active & ~left, mid, hi)
+    return hi
+
+class CompiledForest:
+    """
+    A trained gbtree booster flattened into NumPy arrays.
+
+    All trees share one node table (feature, threshold, default direction, children, leaf
+    value); leaves point to themselves so every row can walk every tree in lock-step for
+    max_depth steps. An optional StandardScaler is folded into the thresholds, so rows
+    are evaluated on raw features with no scaling pass and no DMatrix.
+    """
+    def __init__(self, feature, threshold, default_left, left, right, value, roots, max_depth,
+                 base_margin, objective):
+        self.feature = feature
+        self.threshold = threshold
+        self.default_left = default_left
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.base_margin = np.float32(base_margin)
+        self.objective = objective
+        self.transform = TRANSFORMS[objective]
+
+    @classmethod
+    def from_booster(cls, booster, scaler=None):
+        model = json.loads(booster.save_raw('json'))
+        learner = model['learner']
+        objective = learner['objective']['name']
+        if objective not in TRANSFORMS:
+            raise NotImplementedError(f"objective {objective} is not supported")
+        if learner['gradient_booster']['name'] != 'gbtree':
+            raise NotImplementedError("only gbtree boosters can be compiled")
+
+        # base_score is a float32; XGBoost maps it to a margin in double precision
+        base_score = np.float64(np.float32(learner['learner_model_param']['base_score'].strip('[]')))
+        base_margin = np.log(base_score) if objective in LOG_LINK else base_score
+
+        features, thresholds, default_left, lefts, rights, values, roots = [], [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+        for tree in learner['gradient_booster']['model']['trees']:
+            left = np.asarray(tree['left_children'], dtype=np.int64)
+            right = np.asarray(tree['right_children'], dtype=np.int64)
+            n = len(left)
+            is_leaf = left == -1
+            node_ids = np.arange(n)
+
+            features.append(np.where(is_leaf, 0, tree['split_indices']))
+            thresholds.append(np.where(is_leaf, 0, np.asarray(tree['split_conditions'], dtype=np.float32)))
+            default_left.append(np.asarray(tree['default_left'], dtype=bool))
+            lefts.append(np.where(is_leaf, node_ids, left) + offset)
+            rights.append(np.where(is_leaf, node_ids, right) + offset)
+            # Leaf values are stored in split_conditions
+            values.append(np.where(is_leaf, np.asarray(tree['split_conditions'], dtype=np.float32), 0))
+            roots.append(offset)
+
+            depth = np.zeros(n, dtype=np.int64)
+            for node in range(n):
+                if not is_leaf[node]:
+                    depth[left[node]] = depth[right[node]] = depth[node] + 1
+            max_depth = max(max_depth, int(depth.max()))
+            offset += n
+
+        feature = np.concatenate(features).astype(np.intp)
+        raw_thresholds = np.concatenate(thresholds)
+        if scaler is not None:
+            threshold = fold_thresholds(raw_thresholds, scaler.mean_[feature], scaler.scale_[feature])
+        else:
+            threshold = fold_thresholds(raw_thresholds, np.zeros(len(feature)), np.ones(len(feature)))
+
+        return cls(feature, threshold, np.concatenate(default_left), np.concatenate(lefts),
+                   np.concatenate(rights), np.concatenate(values).astype(np.float32),
+                   np.asarray(roots, dtype=np.intp), max_depth, base_margin, objective)
+
+    def predict_margin(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.default_left[node], x < self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        # Sum leaves tree by tree in float32, in the same order as XGBoost
+        leaves = np.empty((len(X), len(self.roots) + 1), dtype=np.float32)
+        leaves[:, 0] = self.base_margin
+        leaves[:, 1:] = self.value[node]
+        return np.cumsum(leaves, axis=1, dtype=np.float32)[:, -1]
+
+    def predict(self, X):
+        return self.transform(self.predict_margin(X))
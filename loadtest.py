@@ -0,0 +1,243 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+import numpy as np
+import requests
+from benchmark import scratch_dir, write_synthetic_artifacts, smaps_mb, child_pids, free_port, wait_ready, run_metadata
+
+# Capacity test for the web app: start it locally, drive it with concurrent clients
+# issuing a weighted mix of requests, and record latency, errors and memory over time.
+DEFAULT_MIX = 'form=2,page=2,api=4,probabilities=1,batch=1'
+BATCH_SIZE = 380
+PERCENTILES = (50, 95, 99)
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def parse_mix(spec):
+    """
+    {kind: weight} from "form=2,api=4,...". Kinds are the keys of REQUESTS.
+    """
+    mix = {}
+    for part in spec.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in REQUESTS:
+            raise ValueError(f"Unknown request kind {kind!r}; expected one of: {', '.join(REQUESTS)}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+def form_request(session, base, fixtures, rng, batch_size):
+    home, away = rng.choice(fixtures)
+    return session.post(f"{base}/", data={'home_team': home, 'away_team': away})
+
+def page_request(session, base, fixtures, rng, batch_size):
+    home, away = rng.choice(fixtures)
+    return session.get(f"{base}/predict/{quote(home, safe='')}/{quote(away, safe='')}")
+
+def api_request(session, base, fixtures, rng, batch_size):
+    return session.post(f"{base}/api/predict", json=[rng.choice(fixtures)])
+
+def probabilities_request(session, base, fixtures, rng, batch_size):
+    return session.post(f"{base}/api/predict?probabilities=1", json=[rng.choice(fixtures)])
+
+def batch_request(session, base, fixtures, rng, batch_size):
+    return session.post(f"{base}/api/predict", json=rng.choices(fixtures, k=batch_size))
+
+def bulk_request(session, base, fixtures, rng, batch_size):
+    body = 'home_team,away_team\n' + ''.join(f"{h},{a}\n" for h, a in rng.choices(fixtures, k=batch_size))
+    return session.post(f"{base}/api/predict/bulk?format=ndjson", data=body.encode(),
+                        headers={'Content-Type': 'text/csv'})
+
+# Request kind -> function(session, base_url, fixtures, rng, batch_size) returning a response
+REQUESTS = {
+    'form': form_request,
+    'page': page_request,
+    'api': api_request,
+    'probabilities': probabilities_request,
+    'batch': batch_request,
+    'bulk': bulk_request,
+}
+
+def start_server(server, port, workers, workdir):
+    """
+    Start the app from workdir: serve.py with `workers` workers, or the Flask development
+    server (threaded, no debugger) for server='dev'.
+    """
+    if server == 'serve':
+        cmd = [sys.executable, os.path.join(HERE, 'serve.py'), '--port', str(port), '--workers', str(workers)]
+    else:
+        cmd = [sys.executable, '-c', f"from app import app; app.run(port={port}, threaded=True)"]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [HERE, os.environ.get('PYTHONPATH')])))
+    return subprocess.Popen(cmd, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def process_memory(pid):
+    """
+    Summed RSS and PSS in MB of a process and its children (Linux), or None.
+    """
+    try:
+        stats = [smaps_mb(p) for p in [pid] + child_pids(pid)]
+    except (OSError, KeyError):
+        return None
+    return {'rss_mb': sum(s['rss'] for s in stats), 'pss_mb': sum(s['pss'] for s in stats), 'processes': len(stats)}
+
+def latency_summary(latencies, errors, elapsed):
+    """
+    Count, throughput, error rate and latency percentiles (ms) of one set of requests.
+    """
+    count = len(latencies)
+    summary = {'requests': count, 'errors': errors, 'error_rate': errors / count if count else 0.0,
+               'throughput': count / elapsed if elapsed else 0.0}
+    if count:
+        ms = np.asarray(latencies) * 1e3
+        summary['mean_ms'] = float(ms.mean())
+        summary.update({f"p{p}_ms": float(v) for p, v in zip(PERCENTILES, np.percentile(ms, PERCENTILES))})
+        summary['max_ms'] = float(ms.max())
+    return summary
+
+def run_load(base, fixtures, mix, concurrency=8, duration=30.0, warmup=2.0, batch_size=BATCH_SIZE,
+             pid=None, sample_interval=1.0, seed=0):
+    """
+    Drive base_url with `concurrency` client threads for warmup + duration seconds, each
+    picking request kinds by the weights in mix. Only requests started after the warm-up
+    are recorded. Every sample_interval seconds the throughput, p99 and error count of the
+    interval and the server's memory (if pid is given) are sampled. Returns the results.
+    """
+    kinds, weights = list(mix), list(mix.values())
+    records = []  # (kind, latency, ok) per recorded request
+    lock = threading.Lock()
+    start = time.monotonic()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+    stop = threading.Event()
+
+    def client(i):
+        rng = random.Random(seed + i)
+        session = requests.Session()
+        while True:
+            began = time.monotonic()
+            if began >= deadline:
+                break
+            kind = rng.choices(kinds, weights)[0]
+            try:
+                response = REQUESTS[kind](session, base, fixtures, rng, batch_size)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            finished = time.monotonic()
+            if began >= measure_from:
+                with lock:
+                    records.append((kind, finished - began, ok))
+
+    timeline = []
+
+    def sampler():
+        last_count = 0
+        next_sample = measure_from + sample_interval
+        while not stop.wait(max(0.0, next_sample - time.monotonic())):
+            now = next_sample - measure_from
+            with lock:
+                window = records[last_count:]
+                last_count = len(records)
+            point = {'t': round(now, 3), 'requests': len(window),
+                     'throughput': len(window) / sample_interval,
+                     'errors': sum(1 for r in window if not r[2])}
+            if window:
+                point['p99_ms'] = float(np.percentile([r[1] for r in window], 99) * 1e3)
+            if pid is not None:
+                point.update(process_memory(pid) or {})
+            timeline.append(point)
+            next_sample += sample_interval
+
+    sampling = threading.Thread(target=sampler, daemon=True)
+    sampling.start()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    stop.set()
+    sampling.join()
+
+    results = {
+        'overall': latency_summary([r[1] for r in records], sum(1 for r in records if not r[2]), duration),
+        'by_kind': {},
+        'timeline': timeline,
+    }
+    for kind in kinds:
+        rows = [r for r in records if r[0] == kind]
+        results['by_kind'][kind] = latency_summary([r[1] for r in rows], sum(1 for r in rows if not r[2]), duration)
+    return results
+
+def print_report(results):
+    print(f"{'kind':<14}{'req':>8}{'req/s':>9}{'err %':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, summary in [*results['by_kind'].items(), ('overall', results['overall'])]:
+        print(f"{name:<14}{summary['requests']:>8}{summary['throughput']:>9.1f}{summary['error_rate'] * 100:>8.2f}"
+              + ''.join(f"{summary.get(f'p{p}_ms', float('nan')):>9.1f}" for p in PERCENTILES))
+    memory = [point['rss_mb'] for point in results['timeline'] if 'rss_mb' in point]
+    if memory:
+        print(f"Server RSS: {memory[0]:.0f} MB at start, {max(memory):.0f} MB peak, {memory[-1]:.0f} MB at end")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the prediction app on a locally started instance.")
+    parser.add_argument('--server', choices=['serve', 'dev'], default='serve',
+                        help="serve.py pre-fork server (default) or the Flask development server")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="serve.py workers")
+    parser.add_argument('--url', help="test an already running app instead of starting one")
+    parser.add_argument('--pid', type=int, help="with --url, the server process to sample memory from")
+    parser.add_argument('--synthetic', type=int, metavar='SEASONS',
+                        help="serve synthetic data and a freshly trained model from a scratch directory "
+                             "(default: the artifacts in the working directory)")
+    parser.add_argument('--concurrency', type=int, default=8, help="concurrent clients")
+    parser.add_argument('--duration', type=float, default=30.0, help="measured seconds")
+    parser.add_argument('--warmup', type=float, default=2.0, help="unrecorded seconds before measuring")
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help=f"request kinds and weights, from {', '.join(REQUESTS)} (default: {DEFAULT_MIX})")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="fixtures per batch/bulk request")
+    parser.add_argument('--sample-interval', type=float, default=1.0, help="seconds between timeline samples")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='loadtest_results.json', help="results file (JSON)")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    with ExitStack() as stack:
+        if args.synthetic:
+            workdir = stack.enter_context(scratch_dir())
+            teams = write_synthetic_artifacts(args.synthetic, args.seed)
+        else:
+            from bundle import load_bundle
+            workdir = os.getcwd()
+            teams = load_bundle().teams
+        rng = random.Random(args.seed)
+        fixtures = [tuple(rng.sample(teams, 2)) for _ in range(500)]
+
+        pid = args.pid
+        if args.url:
+            base = args.url.rstrip('/')
+        else:
+            port = free_port()
+            base = f"http://127.0.0.1:{port}"
+            server = start_server(args.server, port, args.workers, workdir)
+            pid = server.pid
+
+            def stop_server():
+                server.terminate()
+                server.wait(timeout=60)
+
+            stack.callback(stop_server)
+        wait_ready(f"{base}/readyz")
+
+        print(f"Load test: {base}, {args.concurrency} clients, {args.duration:.0f}s (+{args.warmup:.0f}s warm-up), mix {args.mix}")
+        results = run_load(base, fixtures, mix, args.concurrency, args.duration, args.warmup, args.batch_size,
+                           pid, args.sample_interval, args.seed)
+
+    results['config'] = {key: value for key, value in vars(args).items()}
+    results['config']['mix'] = mix
+    results['metadata'] = run_metadata()
+    print_report(results)
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.out}")
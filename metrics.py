@@ -0,0 +1,251 @@
+import os
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from atomic import atomic_write_bytes
+
+# Latency buckets in seconds, from table lookups (~10us) to cold model loads
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+           0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Add a Server-Timing header with per-stage durations to every response
+TIMING_HEADER = os.environ.get('EPL_TIMING_HEADER', '0') == '1'
+
+# Set by serve.py: every process writes its values to a file in this directory and /metrics sums
+# the files of all processes, live and retired, so the totals a scrape sees do not depend
+# on which worker answered it and never go backwards when workers are replaced
+MULTIPROCESS_DIR = None
+# Seconds between a worker's snapshots; a crashed worker loses at most this much
+FLUSH_INTERVAL = 1.0
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key):
+    if not key:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in key) + '}'
+
+class Counter:
+    """
+    Monotonic counter with optional labels.
+    """
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(values, other):
+        for key, value in other.items():
+            values[key] = values.get(key, 0) + value
+
+    def samples(self, values=None):
+        if values is None:
+            values = self.snapshot()
+        return [(self.name, key, value) for key, value in sorted(values.items())]
+
+class Histogram:
+    """
+    Latency histogram with optional labels. Each observation bumps one bucket; the
+    cumulative counts Prometheus expects are only summed up when rendering.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += 1
+            entry[2] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {key: [list(counts), count, total] for key, (counts, count, total) in self._values.items()}
+
+    @staticmethod
+    def merge(values, other):
+        for key, (counts, count, total) in other.items():
+            entry = values.setdefault(key, [[0] * len(counts), 0, 0.0])
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += count
+            entry[2] += total
+
+    def samples(self, values=None):
+        if values is None:
+            values = self.snapshot()
+        out = []
+        for key, (counts, count, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                out.append((f"{self.name}_bucket", key + (('le', repr(bound)),), cumulative))
+            out.append((f"{self.name}_bucket", key + (('le', '+Inf'),), count))
+            out.append((f"{self.name}_count", key, count))
+            out.append((f"{self.name}_sum", key, total))
+        return out
+
+REGISTRY = []
+
+def counter(name, help_text):
+    metric = Counter(name, help_text)
+    REGISTRY.append(metric)
+    return metric
+
+def histogram(name, help_text, buckets=BUCKETS):
+    metric = Histogram(name, help_text, buckets)
+    REGISTRY.append(metric)
+    return metric
+
+# Hot-path metrics shared by registry.py, predict.py and app.py
+STAGE_SECONDS = histogram('epl_stage_seconds', "Time spent in each serving stage.")
+REQUEST_SECONDS = histogram('epl_request_seconds', "End-to-end request latency by endpoint.")
+REQUESTS = counter('epl_requests_total', "HTTP requests by endpoint and status code.")
+PREDICTIONS = counter('epl_predictions_total', "Fixtures predicted, by source (table or model).")
+UNKNOWN_TEAMS = counter('epl_unknown_team_errors_total', "Fixtures rejected because a team was unknown.")
+MODEL_RELOADS = counter('epl_model_reloads_total', "Model state loads, by result.")
+
+_trace = threading.local()
+
+def start_trace():
+    """
+    Start collecting stage durations for the current thread (one request).
+    """
+    _trace.stages = []
+
+def end_trace():
+    """
+    Stop collecting and return the [(stage, seconds), ...] recorded since start_trace.
+    """
+    stages = getattr(_trace, 'stages', None) or []
+    _trace.stages = None
+    return stages
+
+@contextmanager
+def timed(stage):
+    """
+    Time a block into the stage histogram (and the current trace, if any).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        stages = getattr(_trace, 'stages', None)
+        if stages is not None:
+            stages.append((stage, elapsed))
+
+def server_timing(stages, total=None):
+    """
+    Format stage durations as a Server-Timing header value (milliseconds).
+    """
+    parts = [f"{stage};dur={seconds * 1e3:.3f}" for stage, seconds in stages]
+    if total is not None:
+        parts.append(f"total;dur={total * 1e3:.3f}")
+    return ', '.join(parts)
+
+def reset():
+    """
+    Zero every metric, e.g. in a freshly forked worker that inherited its parent's values.
+    """
+    for metric in REGISTRY:
+        with metric._lock:
+            metric._values = {}
+
+_snapshot = {'pid': None, 'name': None}
+
+def _snapshot_name():
+    # Unique per process, not just per pid: a recycled pid must not overwrite a retired
+    # worker's totals
+    if _snapshot['pid'] != os.getpid():
+        _snapshot.update(pid=os.getpid(), name=f"{os.getpid()}-{time.time_ns()}.json")
+    return _snapshot['name']
+
+def write_snapshot(directory=None):
+    """
+    Atomically write this process's metric values to its file in directory.
+    """
+    directory = directory or MULTIPROCESS_DIR
+    data = {metric.name: [[list(key), value] for key, value in metric.snapshot().items()] for metric in REGISTRY}
+    atomic_write_bytes(os.path.join(directory, _snapshot_name()), json.dumps(data).encode())
+
+def start_flusher(directory=None, interval=FLUSH_INTERVAL):
+    """
+    Write this process's snapshot every interval seconds from a daemon thread.
+    """
+    directory = directory or MULTIPROCESS_DIR
+
+    def flush():
+        while True:
+            time.sleep(interval)
+            try:
+                write_snapshot(directory)
+            except OSError as e:
+                print(f"Metrics snapshot failed: {e}", flush=True)
+
+    threading.Thread(target=flush, daemon=True).start()
+
+def collect(directory=None):
+    """
+    {metric name: values} summed over the last snapshot of every process in directory.
+    This process writes a fresh one first. Every file only grows, so the sums never go
+    backwards between scrapes, whichever worker answers them.
+    """
+    directory = directory or MULTIPROCESS_DIR
+    write_snapshot(directory)
+    totals = {metric.name: {} for metric in REGISTRY}
+    kinds = {metric.name: metric for metric in REGISTRY}
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for metric_name, entries in data.items():
+            if metric_name in kinds:
+                kinds[metric_name].merge(totals[metric_name], {tuple(map(tuple, key)): value for key, value in entries})
+    return totals
+
+def render():
+    """
+    All metrics in the Prometheus text exposition format, summed over every process when
+    MULTIPROCESS_DIR is set.
+    """
+    totals = collect() if MULTIPROCESS_DIR else {}
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, key, value in metric.samples(totals.get(metric.name)):
+            lines.append(f"{name}{_format_labels(key)} {value}")
+    return '\n'.join(lines) + '\n'
@@ -1,18 +1,42 @@
-import pandas as pd
+import os
+import time
+import random
+import itertools
+import argparse
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+import xgboost as xgb
 from sklearn.model_selection import train_test_split
 from xgboost import XGBRegressor
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_squared_error
-import pickle
+from data import load_dataset
+from features import FEATURES
+from bundle import save_bundle
 
-def train_models(df):
+# Same model as train_models, expressed as native xgb.train parameters
+BASE_PARAMS = {'objective': 'count:poisson', 'tree_method': 'hist', 'max_depth': 6, 'eta': 0.1, 'seed': 42}
+NUM_BOOST_ROUND = 200
+
+# Hyperparameter search space, sampled without replacement
+SEARCH_SPACE = {
+    'max_depth': [3, 4, 5, 6, 8],
+    'eta': [0.03, 0.05, 0.1, 0.2],
+    'min_child_weight': [1, 3, 5, 10],
+    'subsample': [0.7, 0.85, 1.0],
+    'colsample_bytree': [0.6, 0.8, 1.0],
+}
+MAX_SEARCH_ROUNDS = 2000
+EARLY_STOPPING_ROUNDS = 30
+
+def train_models(df, teams):
     """
-    Train Random Forest models for home and away goals with additional features.
+    Train Random Forest models for home and away goals with additional features,
+    and publish them with the scaler and team vocabulary as one model bundle.
     """
-    features = ['HomeTeam_encoded', 'AwayTeam_encoded', 'HST', 'AST', 'HC', 'AC', 'HF', 'AF', 'HY', 'AY', 'HR', 'AR',
-                'HomeRollingGF', 'HomeRollingGA', 'AwayRollingGF', 'AwayRollingGA', 'HomeForm', 'AwayForm',
-                'HomeStrength', 'AwayStrength', 'FormInteraction', 'StrengthInteraction']
-    X = df[features]
+    X = df[FEATURES]
     y_home = df['FTHG']
     y_away = df['FTAG']
 
@@ -37,17 +61,142 @@ def train_models(df):
     away_pred = away_model.predict(X_test_scaled)
     print(f"Away Goals MSE: {mean_squared_error(y_away_test, away_pred)}")
 
-    # Save models and scaler
-    with open('home_model.pkl', 'wb') as f:
-        pickle.dump(home_model, f)
-    with open('away_model.pkl', 'wb') as f:
-        pickle.dump(away_model, f)
-    with open('scaler.pkl', 'wb') as f:
-        pickle.dump(scaler, f)
+    # Save models, scaler and teams as one versioned bundle
+    version = save_bundle(home_model.get_booster(), away_model.get_booster(), scaler, teams, FEATURES)
+    print(f"Model bundle {version} published.")
 
     return home_model, away_model, scaler
 
+@contextmanager
+def stage(timings, name):
+    """
+    Time a pipeline stage, print it and record it in timings.
+    """
+    start = time.perf_counter()
+    yield
+    timings[name] = round(time.perf_counter() - start, 3)
+    print(f"[{timings[name]:8.3f}s] {name}")
+
+def sample_search_space(n_trials, seed=42):
+    keys = sorted(SEARCH_SPACE)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*[SEARCH_SPACE[k] for k in keys])]
+    return random.Random(seed).sample(grid, min(n_trials, len(grid)))
+
+_search_data = None
+
+def _init_search_worker(data):
+    global _search_data
+    _search_data = data
+
+def _run_trial(args):
+    """
+    Fit one candidate with early stopping on the validation fold (runs in a pool worker).
+    """
+    target, params, nthread = args
+    X_fit, X_val, y_fit, y_val = _search_data[target]
+    params = dict(BASE_PARAMS, **params, nthread=nthread, eval_metric='poisson-nloglik')
+    dfit = xgb.DMatrix(X_fit, label=y_fit, nthread=nthread)
+    dval = xgb.DMatrix(X_val, label=y_val, nthread=nthread)
+    booster = xgb.train(params, dfit, MAX_SEARCH_ROUNDS, evals=[(dval, 'valid')],
+                        early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=False)
+    return target, params, booster.best_iteration + 1, booster.best_score
+
+def search_params(X_train_scaled, y_home_train, y_away_train, n_trials, n_jobs=None):
+    """
+    Random search over SEARCH_SPACE for both targets across a process pool, with early
+    stopping on a held-out 20% of the training split. Returns {target: (params, n_rounds)}.
+    """
+    cores = os.cpu_count() or 1
+    n_jobs = n_jobs or cores
+    nthread = max(1, cores // n_jobs)
+    data = {}
+    for target, y in [('home', y_home_train), ('away', y_away_train)]:
+        data[target] = train_test_split(X_train_scaled, np.asarray(y), test_size=0.2, random_state=42)
+
+    trials = [(target, params, nthread) for params in sample_search_space(n_trials) for target in data]
+    best = {}
+    # spawn, not fork: forking a process that may hold OpenMP threads can deadlock
+    with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_search_worker, initargs=(data,)) as pool:
+        for target, params, n_rounds, score in pool.map(_run_trial, trials):
+            if target not in best or score < best[target][2]:
+                best[target] = (params, n_rounds, score)
+    for target, (params, n_rounds, score) in best.items():
+        print(f"Best {target} params ({n_rounds} rounds, valid poisson-nloglik {score:.4f}): "
+              f"{ {k: params[k] for k in SEARCH_SPACE} }")
+    return {target: (params, n_rounds) for target, (params, n_rounds, _) in best.items()}
+
+def train_models_parallel(df, teams, n_trials=0, n_jobs=None):
+    """
+    Faster training pipeline: scale once, build one quantized training matrix shared by
+    both targets (hist method), optionally search hyperparameters, then fit the home and
+    away boosters concurrently. Prints wall-clock time per stage and publishes a bundle.
+    """
+    timings = {}
+    cores = os.cpu_count() or 1
+
+    with stage(timings, 'split and scale'):
+        X = df[FEATURES].to_numpy(dtype=np.float64)
+        X_train, X_test, y_home_train, y_home_test, y_away_train, y_away_test = train_test_split(
+            X, df['FTHG'].to_numpy(), df['FTAG'].to_numpy(), test_size=0.2, random_state=42
+        )
+        scaler = StandardScaler()
+        X_train_scaled = np.ascontiguousarray(scaler.fit_transform(X_train), dtype=np.float32)
+        X_test_scaled = scaler.transform(X_test)
+
+    params = {'home': (dict(BASE_PARAMS), NUM_BOOST_ROUND), 'away': (dict(BASE_PARAMS), NUM_BOOST_ROUND)}
+    if n_trials:
+        with stage(timings, f'hyperparameter search ({n_trials} trials x 2 targets)'):
+            params = search_params(X_train_scaled, y_home_train, y_away_train, n_trials, n_jobs)
+
+    with stage(timings, 'build training matrix'):
+        # Quantile cuts are sketched once; the away matrix reuses them via ref
+        dtrain = {'home': xgb.QuantileDMatrix(X_train_scaled, label=y_home_train, nthread=cores)}
+        dtrain['away'] = xgb.QuantileDMatrix(X_train_scaled, label=y_away_train, ref=dtrain['home'], nthread=cores)
+
+    def fit(target):
+        target_params, n_rounds = params[target]
+        target_params = dict(target_params, nthread=max(1, cores // 2))
+        target_params.pop('eval_metric', None)
+        return xgb.train(target_params, dtrain[target], n_rounds)
+
+    with stage(timings, 'fit home and away models concurrently'):
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            home_booster, away_booster = pool.map(fit, ['home', 'away'])
+
+    with stage(timings, 'evaluate'):
+        home_pred = home_booster.inplace_predict(X_test_scaled)
+        away_pred = away_booster.inplace_predict(X_test_scaled)
+        print(f"Home Goals MSE: {mean_squared_error(y_home_test, home_pred)}")
+        print(f"Away Goals MSE: {mean_squared_error(y_away_test, away_pred)}")
+
+    with stage(timings, 'save bundle'):
+        version = save_bundle(home_booster, away_booster, scaler, teams, FEATURES, extra={
+            'training': {
+                'mode': 'parallel',
+                'params': {target: dict(p, num_boost_round=n) for target, (p, n) in params.items()},
+                'stage_seconds': dict(timings),
+            },
+        })
+    print(f"Model bundle {version} published. Total {sum(timings.values()):.3f}s")
+
+    return home_booster, away_booster, scaler
+
 if __name__ == "__main__":
-    df = pd.read_csv('epl_data.csv')
-    train_models(df)
+    parser = argparse.ArgumentParser(description="Train the home and away goal models.")
+    parser.add_argument('--parallel', action='store_true',
+                        help="hist method, shared training matrix, concurrent home/away fits and stage timings")
+    parser.add_argument('--search', type=int, default=0, metavar='N',
+                        help="random-search N hyperparameter sets with early stopping (implies --parallel)")
+    parser.add_argument('--jobs', type=int, default=None, help="search worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    df = load_dataset(FEATURES + ['FTHG', 'FTAG', 'HomeTeam'])
+    # The categorical team column carries the full team vocabulary in TeamRegistry id order
+    # (append-only, not sorted), so category codes are the stable team ids
+    teams = list(df['HomeTeam'].cat.categories)
+    if args.parallel or args.search:
+        train_models_parallel(df, teams, n_trials=args.search, n_jobs=args.jobs)
+    else:
+        train_models(df, teams)
     print("Models trained and saved.")
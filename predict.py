@@ -1,69 +1,168 @@
-import pickle
 import numpy as np
-import pandas as pd
+from registry import registry
+from metrics import timed, PREDICTIONS, UNKNOWN_TEAMS
 
 def load_models():
-    with open('home_model.pkl', 'rb') as f:
-        home_model = pickle.load(f)
-    with open('away_model.pkl', 'rb') as f:
-        away_model = pickle.load(f)
-    with open('label_encoder.pkl', 'rb') as f:
-        le = pickle.load(f)
-    with open('scaler.pkl', 'rb') as f:
-        scaler = pickle.load(f)
-    df = pd.read_csv('epl_data.csv')
-    return home_model, away_model, le, scaler, df
+    """
+    Return the shared, already-loaded (home_model, away_model, teams, scaler, df).
+    """
+    return registry.get().as_tuple()
 
-def predict_score(home_team, away_team):
-    home_model, away_model, le, scaler, df = load_models()
-    try:
-        home_encoded = le.transform([home_team])[0]
-        away_encoded = le.transform([away_team])[0]
-    except ValueError:
-        return "Unknown team(s)", "Unknown team(s)"
+UNKNOWN_TEAM = "Unknown team(s)"
+NO_HISTORY = "Neither team has played before the date"
+# Scoreline grids cover 0..MAX_GOALS goals per side; the last cell absorbs the tail
+MAX_GOALS = 10
 
-    # Get latest stats for teams
-    home_latest = df[df['HomeTeam'] == home_team].sort_values('Date').iloc[-1] if not df[df['HomeTeam'] == home_team].empty else None
-    away_latest = df[df['AwayTeam'] == away_team].sort_values('Date').iloc[-1] if not df[df['AwayTeam'] == away_team].empty else None
+def predict_rates(fixtures, as_of=None, state=None, return_errors=False):
+    """
+    Expected (untruncated) home and away goals for a list of (home_team, away_team)
+    fixtures, predicted in one batch, as an (n, 2) float array. Rows of fixtures with an
+    unknown team are NaN.
 
-    if home_latest is None or away_latest is None:
-        # Fallback to averages
-        home_stats = df[['HST', 'HC', 'HF', 'HY', 'HR']].mean()
-        away_stats = df[['AST', 'AC', 'AF', 'AY', 'AR']].mean()
-        home_rolling_gf = df['FTHG'].mean()
-        home_rolling_ga = df['FTAG'].mean()
-        home_form = 1.5
-        away_rolling_gf = df['FTAG'].mean()
-        away_rolling_ga = df['FTHG'].mean()
-        away_form = 1.5
-        home_strength = 0
-        away_strength = 0
+    as_of predicts fixtures as they would have looked on a day, from both teams' state
+    before it: one date for all fixtures, or one per fixture (None uses the latest state).
+    A dated fixture whose teams had neither played before the date is NaN too.
+    state is the ModelState to predict with (default: the registry's current one); pass
+    the one a caller already validated against so a reload cannot swap it in between.
+    With return_errors=True, also returns the error (UNKNOWN_TEAM or NO_HISTORY, else
+    None) of every fixture.
+    """
+    state = state or registry.get()
+    index = state.team_index
+    rates = np.full((len(fixtures), 2), np.nan)
+    errors = [UNKNOWN_TEAM] * len(fixtures)
+    result = (rates, errors) if return_errors else rates
+
+    rows, home_ids, away_ids = [], [], []
+    with timed('encode'):
+        for i, (home_team, away_team) in enumerate(fixtures):
+            try:
+                home_encoded = index.encode(home_team)
+                away_encoded = index.encode(away_team)
+            except ValueError:
+                continue
+            rows.append(i)
+            home_ids.append(home_encoded)
+            away_ids.append(away_encoded)
+    if len(rows) < len(fixtures):
+        UNKNOWN_TEAMS.inc(len(fixtures) - len(rows))
+    for row in rows:
+        errors[row] = None
+    if not rows:
+        return result
+
+    if as_of is not None:
+        dates = [as_of] * len(fixtures) if np.ndim(as_of) == 0 else list(as_of)
+        dated = [i for i, row in enumerate(rows) if dates[row] is not None]
+        if dated:
+            store = state.feature_store
+            dated_home = [home_ids[i] for i in dated]
+            dated_away = [away_ids[i] for i in dated]
+            dated_dates = [dates[rows[i]] for i in dated]
+            # Without any past match there is nothing to build features from
+            history = store.history(dated_home, dated_away, dated_dates)
+            for i in np.flatnonzero(~history):
+                errors[rows[dated[i]]] = NO_HISTORY
+            if history.any():
+                # Point-in-time features gathered with one binary search per team and side
+                keep = np.flatnonzero(history)
+                with timed('features'):
+                    X = store.assemble(np.take(dated_home, keep), np.take(dated_away, keep),
+                                       [dated_dates[i] for i in keep])
+                with timed('inference'):
+                    home_rates, away_rates = state.predict_rates(X)
+                dated_rows = [rows[dated[i]] for i in keep]
+                rates[dated_rows, 0] = home_rates
+                rates[dated_rows, 1] = away_rates
+                PREDICTIONS.inc(len(keep), source='as_of')
+            latest = [i for i, row in enumerate(rows) if dates[row] is None]
+            rows = [rows[i] for i in latest]
+            home_ids = [home_ids[i] for i in latest]
+            away_ids = [away_ids[i] for i in latest]
+            if not rows:
+                return result
+
+    if state.pairings is not None:
+        # Every pairing was predicted when the model loaded
+        with timed('lookup'):
+            rates[rows] = state.pairings[home_ids, away_ids]
+        PREDICTIONS.inc(len(rows), source='table')
     else:
-        home_stats = home_latest[['HST', 'HC', 'HF', 'HY', 'HR']]
-        away_stats = away_latest[['AST', 'AC', 'AF', 'AY', 'AR']]
-        home_rolling_gf = home_latest['HomeRollingGF']
-        home_rolling_ga = home_latest['HomeRollingGA']
-        home_form = home_latest['HomeForm']
-        away_rolling_gf = away_latest['AwayRollingGF']
-        away_rolling_ga = away_latest['AwayRollingGA']
-        away_form = away_latest['AwayForm']
-        home_strength = home_latest['HomeStrength']
-        away_strength = away_latest['AwayStrength']
+        # Latest stats for all teams (or league averages) gathered from the prebuilt index
+        with timed('features'):
+            X = index.assemble(home_ids, away_ids)
+        with timed('inference'):
+            home_rates, away_rates = state.predict_rates(X)
+        rates[rows, 0] = home_rates
+        rates[rows, 1] = away_rates
+        PREDICTIONS.inc(len(rows), source='model')
+    return result
+
+def predict_scores(fixtures, as_of=None, state=None):
+    """
+    Predict a list of (home_team, away_team) fixtures in one batch: one feature matrix,
+    one scaler pass and one predict call per model. Fixtures with an unknown team get
+    ("Unknown team(s)", "Unknown team(s)") in their slot, dated fixtures without any
+    history (NO_HISTORY, NO_HISTORY). See predict_rates for as_of and state.
+    """
+    return scores_from_rates(*predict_rates(fixtures, as_of, state, return_errors=True))
+
+def scores_from_rates(rates, errors=None):
+    """
+    Truncate (n, 2) expected goals to integer scores; NaN rows become their error from
+    errors (as returned by predict_rates), or UNKNOWN_TEAM.
+    """
+    known = ~np.isnan(rates[:, 0])
+    goals = np.where(known[:, None], rates, 0).astype(int)
+    errors = errors or [None] * len(rates)
+    return [(h, a) if ok else (error or UNKNOWN_TEAM, error or UNKNOWN_TEAM)
+            for ok, (h, a), error in zip(known.tolist(), goals.tolist(), errors)]
+
+def predict_score(home_team, away_team, as_of=None, state=None):
+    return predict_scores([(home_team, away_team)], as_of, state)[0]
+
+def poisson_pmf(rates, max_goals=MAX_GOALS):
+    """
+    P(goals = k) for k = 0..max_goals for every rate, shape rates.shape + (max_goals + 1,).
+    The last entry holds P(goals >= max_goals), so each distribution sums to 1.
+    """
+    rates = np.asarray(rates, dtype=np.float64)[..., None]
+    k = np.arange(max_goals + 1)
+    log_factorial = np.concatenate([[0.0], np.cumsum(np.log(k[1:]))])
+    pmf = np.exp(k * np.log(np.maximum(rates, 1e-12)) - rates - log_factorial)
+    pmf[..., -1] = np.clip(1.0 - pmf[..., :-1].sum(axis=-1), 0.0, None)
+    return pmf
 
-    form_interaction = home_form * away_form
-    strength_interaction = home_strength * away_strength
+def scoreline_probabilities(home_rates, away_rates, max_goals=MAX_GOALS):
+    """
+    (n, max_goals + 1, max_goals + 1) grids with P(home = i, away = j) for each fixture,
+    treating home and away goals as independent Poisson counts.
+    """
+    return poisson_pmf(home_rates, max_goals)[:, :, None] * poisson_pmf(away_rates, max_goals)[:, None, :]
 
-    features = np.array([[home_encoded, away_encoded, home_stats['HST'], away_stats['AST'],
-                          home_stats['HC'], away_stats['AC'], home_stats['HF'], away_stats['AF'],
-                          home_stats['HY'], away_stats['AY'], home_stats['HR'], away_stats['AR'],
-                          home_rolling_gf, home_rolling_ga, away_rolling_gf, away_rolling_ga,
-                          home_form, away_form, home_strength, away_strength, form_interaction, strength_interaction]])
+def outcome_probabilities(grids):
+    """
+    (n, 3) home win / draw / away win probabilities from scoreline grids.
+    """
+    home_win = np.tril(grids, -1).sum(axis=(-2, -1))
+    draw = np.einsum('...ii->...', grids)
+    away_win = np.triu(grids, 1).sum(axis=(-2, -1))
+    return np.stack([home_win, draw, away_win], axis=-1)
 
-    features_scaled = scaler.transform(features)
-    home_goals = int(home_model.predict(features_scaled)[0])
-    away_goals = int(away_model.predict(features_scaled)[0])
-    return home_goals, away_goals
+def predict_probabilities(fixtures, max_goals=MAX_GOALS, as_of=None, state=None, return_errors=False):
+    """
+    Expected goals, scoreline grids and home/draw/away probabilities for a batch of
+    fixtures. Rows of fixtures with an unknown team (or no history before their date) are
+    NaN; return_errors=True appends predict_rates' per-fixture errors.
+    """
+    rates, errors = predict_rates(fixtures, as_of, state, return_errors=True)
+    grids = scoreline_probabilities(rates[:, 0], rates[:, 1], max_goals)
+    result = rates, grids, outcome_probabilities(grids)
+    return result + (errors,) if return_errors else result
 
 if __name__ == "__main__":
     home, away = predict_score('Arsenal', 'Chelsea')
     print(f"Predicted score: {home} - {away}")
+    rates, grids, outcomes = predict_probabilities([('Arsenal', 'Chelsea')])
+    print(f"Expected goals: {rates[0, 0]:.2f} - {rates[0, 1]:.2f}")
+    print(f"Home win {outcomes[0, 0]:.1%}, draw {outcomes[0, 1]:.1%}, away win {outcomes[0, 2]:.1%}")
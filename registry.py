@@ -0,0 +1,235 @@
+import os
+import io
+import hashlib
+import threading
+import time
+import numpy as np
+import pandas as pd
+from atomic import atomic_write_bytes
+from features import TeamIndex, FeatureStore, INDEX_COLUMNS
+from bundle import BUNDLE_DIR, CURRENT_FILE, load_bundle
+from metrics import timed, MODEL_RELOADS
+
+# Directory holding the trained artifacts (defaults to the working directory)
+MODEL_DIR = os.environ.get('EPL_MODEL_DIR', '.')
+
+# Files whose change means a new servable version: the bundle pointer and the dataset
+ARTIFACTS = {
+    'bundle': os.path.join(BUNDLE_DIR, CURRENT_FILE),
+    'df': 'epl_data.parquet',
+}
+
+# Precompute every home/away pairing at load time and answer predictions by lookup
+PRECOMPUTE_PAIRINGS = os.environ.get('EPL_PRECOMPUTE_PAIRINGS', '1') == '1'
+# Also cache the pairing matrix on disk next to the model bundles
+PERSIST_PAIRINGS = os.environ.get('EPL_PERSIST_PAIRINGS', '0') == '1'
+PAIRINGS_FILE = 'pairings.npz'
+# 'xgboost' (Booster.inplace_predict) or 'compiled' (flattened NumPy trees, see forest.py)
+INFERENCE_ENGINE = os.environ.get('EPL_INFERENCE_ENGINE', 'xgboost')
+# Above this many rows XGBoost's multithreaded predictor wins, even with the compiled engine
+COMPILED_MAX_ROWS = 64
+
+class ModelState:
+    """
+    One immutable servable version: a model bundle (boosters loaded lazily), its scaler and
+    team vocabulary, the dataset and the per-team index built from it. The point-in-time
+    FeatureStore for as-of predictions is built from the same dataset on first use.
+    """
+    def __init__(self, bundle, df, version, signature, engine=INFERENCE_ENGINE):
+        self.bundle = bundle
+        self.engine = engine
+        self.scaler = bundle.scaler
+        self.teams = bundle.teams
+        self.df = df
+        self.team_index = TeamIndex(df, bundle.teams)
+        self.version = version
+        self.signature = signature
+        self.loaded_at = time.time()
+        # (n_teams, n_teams, 2) float32 expected goals indexed [home_id, away_id], or None
+        self.pairings = None
+        self._feature_store = None
+        self._lock = threading.Lock()
+
+    @property
+    def home_model(self):
+        return self.bundle.home_model
+
+    @property
+    def away_model(self):
+        return self.bundle.away_model
+
+    @property
+    def feature_store(self):
+        store = self._feature_store
+        if store is None:
+            with self._lock:
+                store = self._feature_store
+                if store is None:
+                    with timed('feature_store'):
+                        store = self._feature_store = FeatureStore(self.df, self.teams)
+        return store
+
+    def predict_rates(self, X):
+        """
+        Expected home and away goals for a matrix of raw (unscaled) feature rows.
+        """
+        if self.engine == 'compiled' and len(X) <= COMPILED_MAX_ROWS:
+            return self.bundle.compiled('home').predict(X), self.bundle.compiled('away').predict(X)
+        features_scaled = self.scaler.transform(X)
+        return self.home_model.predict(features_scaled), self.away_model.predict(features_scaled)
+
+    def compute_pairings(self):
+        """
+        Predict every home/away pairing of encoded teams in one batch.
+        """
+        n = len(self.team_index.team_ids)
+        ids = np.arange(n)
+        home_rates, away_rates = self.predict_rates(self.team_index.assemble(np.repeat(ids, n), np.tile(ids, n)))
+        return np.stack([home_rates, away_rates], axis=-1).astype(np.float32).reshape(n, n, 2)
+
+    def as_tuple(self):
+        return self.home_model, self.away_model, self.teams, self.scaler, self.df
+
+class ModelRegistry:
+    """
+    Process-wide cache of the current ModelState.
+
+    Artifacts are loaded once and shared. Every check_interval seconds the files are
+    stat'ed; if their mtime/size changed, a new state is loaded in full and swapped in
+    with a single reference assignment. Readers keep using the old state until the new
+    one is complete, and a failed or torn load leaves the old state in place.
+    """
+    def __init__(self, model_dir=MODEL_DIR, check_interval=1.0, precompute_pairings=PRECOMPUTE_PAIRINGS,
+                 persist_pairings=PERSIST_PAIRINGS, engine=INFERENCE_ENGINE):
+        self.model_dir = model_dir
+        self.engine = engine
+        self.check_interval = check_interval
+        self.precompute_pairings = precompute_pairings
+        self.persist_pairings = persist_pairings
+        self._state = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.model_dir, ARTIFACTS[name])
+
+    def _signature(self):
+        sig = []
+        for name in ARTIFACTS:
+            st = os.stat(self._path(name))
+            sig.append((name, st.st_mtime_ns, st.st_size))
+        return tuple(sig)
+
+    def _load(self):
+        try:
+            with timed('model_load'):
+                state = self._load_state()
+        except Exception:
+            MODEL_RELOADS.inc(result='error')
+            raise
+        MODEL_RELOADS.inc(result='ok')
+        return state
+
+    def _load_state(self):
+        signature = self._signature()
+        with timed('bundle_read'):
+            bundle = load_bundle(os.path.join(self.model_dir, BUNDLE_DIR))
+            with open(self._path('df'), 'rb') as f:
+                df_blob = f.read()
+        # Files changed while we were reading them: treat as torn and retry later
+        if self._signature() != signature:
+            raise RuntimeError("model artifacts changed during load")
+
+        # Serving version covers both the model bundle and the dataset it is paired with
+        version = hashlib.sha256(bundle.version.encode() + df_blob).hexdigest()[:12]
+        with timed('dataset_parse'):
+            df = pd.read_parquet(io.BytesIO(df_blob), columns=INDEX_COLUMNS)
+        with timed('team_index'):
+            state = ModelState(bundle=bundle, df=df, version=version, signature=signature, engine=self.engine)
+        if self.precompute_pairings:
+            with timed('pairings'):
+                state.pairings = self._load_pairings(state)
+        return state
+
+    def _load_pairings(self, state):
+        """
+        Reuse the persisted pairing matrix if it belongs to this version, otherwise rebuild it.
+        """
+        path = os.path.join(self.model_dir, PAIRINGS_FILE)
+        if self.persist_pairings and os.path.exists(path):
+            try:
+                with np.load(path) as cached:
+                    if str(cached['version']) == state.version:
+                        return cached['rates']
+            except Exception as e:
+                print(f"Ignoring unreadable {path}: {e}")
+
+        rates = state.compute_pairings()
+        if self.persist_pairings:
+            buf = io.BytesIO()
+            np.savez(buf, version=state.version, rates=rates)
+            atomic_write_bytes(path, buf.getvalue())
+        return rates
+
+    def reload(self, force=False):
+        """
+        Load the artifacts from disk if they changed (or always, with force=True).
+        Returns True if a new state was swapped in.
+        """
+        with self._lock:
+            self._last_check = time.monotonic()
+            if not force and self._state is not None and self._signature() == self._state.signature:
+                return False
+            state = self._load()
+            self._state = state
+            return True
+
+    def get(self):
+        """
+        Return the current ModelState, loading it on first use and picking up changed files.
+        """
+        state = self._state
+        if state is None:
+            with self._lock:
+                if self._state is None:
+                    self._state = self._load()
+                    self._last_check = time.monotonic()
+                return self._state
+
+        if self.check_interval is not None and time.monotonic() - self._last_check >= self.check_interval:
+            # Only one thread reloads; everyone else keeps serving the current state
+            if self._lock.acquire(blocking=False):
+                try:
+                    self._last_check = time.monotonic()
+                    if self._signature() != state.signature:
+                        self._state = self._load()
+                except Exception as e:
+                    print(f"Model reload skipped: {e}")
+                finally:
+                    self._lock.release()
+        return self._state
+
+    def changed(self):
+        """
+        True if the artifacts on disk differ from the loaded state (without loading them).
+        """
+        state = self._state
+        try:
+            return state is None or self._signature() != state.signature
+        except OSError:
+            # Artifacts are being replaced; look again on the next check
+            return False
+
+    @property
+    def loaded(self):
+        return self._state is not None
+
+    @property
+    def version(self):
+        return self.get().version
+
+# Shared by app.py and predict.py
+registry = ModelRegistry()
+
+def get_state():
+    return registry.get()
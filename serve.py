@@ -0,0 +1,209 @@
+import os
+import gc
+import sys
+import time
+import signal
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+from werkzeug.serving import make_server
+import metrics
+
+# Pre-fork production server: the master loads the model once, then forks workers that
+# share it copy-on-write and accept connections from one listening socket.
+WORKERS = int(os.environ.get('EPL_WORKERS', os.cpu_count() or 1))
+CHECK_INTERVAL = float(os.environ.get('EPL_RELOAD_INTERVAL', '2.0'))
+# How long a retiring worker may take to finish its in-flight request
+GRACEFUL_TIMEOUT = 30.0
+
+def run_worker(app, sock):
+    """
+    Serve requests from the inherited socket until SIGTERM, then finish the current
+    request and exit. The worker counts its metrics from zero and snapshots them for the
+    other processes' /metrics, a last time on the way out.
+    """
+    metrics.reset()
+    metrics.start_flusher()
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, app, fd=sock.fileno())
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever to return, so call it from another thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    server.serve_forever()
+    metrics.write_snapshot()
+    os._exit(0)
+
+def warm_up(state):
+    """
+    Build the boosters, the compiled trees (if selected) and the as-of feature store in the
+    master so that every worker shares them instead of building its own copy on first use.
+    """
+    X = state.team_index.assemble([0], [0])
+    state.predict_rates(X)
+    X_scaled = state.scaler.transform(X)
+    state.home_model.predict(X_scaled)
+    state.away_model.predict(X_scaled)
+    if state.engine == 'compiled':
+        state.bundle.compiled('home')
+        state.bundle.compiled('away')
+    state.feature_store
+
+class Master:
+    """
+    Forks and supervises the workers. Dead workers are replaced; when a new model version
+    appears on disk (or on SIGHUP) the master loads it first, then starts a fresh
+    generation of workers on it and gracefully retires the old ones.
+    """
+    def __init__(self, app, registry, sock, workers=WORKERS, check_interval=CHECK_INTERVAL):
+        self.app = app
+        self.registry = registry
+        self.sock = sock
+        self.n_workers = workers
+        self.check_interval = check_interval
+        self.workers = {}
+        self.stopping = False
+        self.reload_requested = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(self.app, self.sock)
+            finally:
+                os._exit(1)
+        self.workers[pid] = self.registry.version
+        return pid
+
+    def fill(self):
+        """
+        Start workers until n_workers of them serve the current model version.
+        """
+        version = self.registry.version
+        missing = self.n_workers - sum(1 for v in self.workers.values() if v == version)
+        if missing <= 0:
+            return
+        # Objects created so far are never touched by the cyclic GC in the children,
+        # which keeps their pages shared instead of copied on the first collection
+        gc.collect()
+        gc.freeze()
+        for _ in range(missing):
+            self.spawn()
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            version = self.workers.pop(pid, None)
+            if version is not None and not self.stopping and version == self.registry.version:
+                print(f"Worker {pid} exited with status {status}; restarting", flush=True)
+
+    def reload(self):
+        """
+        Load the new model in the master, then roll the workers over to it.
+        """
+        try:
+            if not self.registry.reload(force=self.reload_requested):
+                return
+        except Exception as e:
+            print(f"Model reload skipped: {e}", flush=True)
+            metrics.write_snapshot()
+            return
+        warm_up(self.registry.get())
+        # The master's own counters (model loads) are part of the totals too
+        metrics.write_snapshot()
+        version = self.registry.version
+        old = [pid for pid, v in self.workers.items() if v != version]
+        print(f"Serving model version {version}; replacing {len(old)} workers", flush=True)
+        # New workers are accepting before the old ones stop, so no request is refused
+        self.fill()
+        for pid in old:
+            self.signal(pid, signal.SIGTERM)
+
+    def signal(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+        metrics.write_snapshot()
+        self.fill()
+        print(f"Master {os.getpid()} serving model {self.registry.version} with {self.n_workers} workers", flush=True)
+
+        last_check = time.monotonic()
+        while not self.stopping:
+            time.sleep(0.2)
+            self.reap()
+            if self.stopping:
+                break
+            if self.reload_requested or time.monotonic() - last_check >= self.check_interval:
+                last_check = time.monotonic()
+                if self.reload_requested or self.registry.changed():
+                    self.reload()
+                    self.reload_requested = False
+            self.fill()
+        self.shutdown()
+
+    def handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def handle_reload(self, signum, frame):
+        self.reload_requested = True
+
+    def shutdown(self):
+        for pid in list(self.workers):
+            self.signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        for pid in list(self.workers):
+            self.signal(pid, signal.SIGKILL)
+        self.reap()
+
+def listen(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the app with a pre-forked pool of workers.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        sys.exit("serve.py needs os.fork(); on Windows use `python app.py`")
+
+    sock = listen(args.host, args.port)
+    # Importing the app loads the model state once, in the master
+    from app import app
+    from registry import registry
+    # Workers never reload on their own; the master replaces them instead
+    registry.check_interval = None
+    warm_up(registry.get())
+    # Workers share their metrics through snapshot files, so any of them answers /metrics
+    # with the totals of the whole server
+    metrics.MULTIPROCESS_DIR = tempfile.mkdtemp(prefix='epl-metrics-')
+    try:
+        Master(app, registry, sock, workers=args.workers).run()
+    finally:
+        shutil.rmtree(metrics.MULTIPROCESS_DIR, ignore_errors=True)
@@ -0,0 +1,186 @@
+import os
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from data import load_dataset
+from predict import predict_rates, poisson_pmf
+from registry import registry
+
+N_SIMULATIONS = 100_000
+# Seasons simulated per vectorized draw; bounds memory to a few (batch, fixtures) arrays
+BATCH_SIZE = 5_000
+TOP_N = 4
+RELEGATED = 3
+
+def season_fixtures(df, season=None, fresh=False):
+    """
+    Teams, current standings, remaining fixtures and as-of date of a season (default: the
+    latest).
+
+    The fixture list is the double round-robin of every team seen in the season; pairings
+    not played yet are remaining. Standings are an int array of (points, goal difference,
+    goals for) per team. With fresh=True the whole season is remaining and standings are zero.
+    as_of is the date whose point-in-time team state the remaining fixtures are predicted
+    from: None (the latest state) for the latest season, else the day after the season's
+    last played match, or its first match day with fresh=True.
+    """
+    df = df.assign(Season=df['Season'].astype(str), HomeTeam=df['HomeTeam'].astype(str),
+                   AwayTeam=df['AwayTeam'].astype(str))
+    latest = df['Season'].iloc[-1]
+    season = season or latest
+    played = df[df['Season'] == season]
+    if played.empty:
+        raise ValueError(f"No matches for season {season}")
+    teams = sorted(set(played['HomeTeam']) | set(played['AwayTeam']))
+    dates = pd.to_datetime(played['Date'])
+    if fresh:
+        as_of = str(dates.min().date())
+        played = played.iloc[:0]
+    elif season != latest:
+        # As-of state only covers matches strictly before the date
+        as_of = str((dates.max() + pd.Timedelta(days=1)).date())
+    else:
+        as_of = None
+
+    team_ids = {team: i for i, team in enumerate(teams)}
+    home = played['HomeTeam'].map(team_ids).to_numpy()
+    away = played['AwayTeam'].map(team_ids).to_numpy()
+    hg = played['FTHG'].to_numpy(dtype=np.int64)
+    ag = played['FTAG'].to_numpy(dtype=np.int64)
+    n = len(teams)
+    points = (np.bincount(home, 3 * (hg > ag) + (hg == ag), n) +
+              np.bincount(away, 3 * (ag > hg) + (hg == ag), n))
+    goal_diff = np.bincount(home, hg - ag, n) + np.bincount(away, ag - hg, n)
+    goals_for = np.bincount(home, hg, n) + np.bincount(away, ag, n)
+    standings = np.stack([points, goal_diff, goals_for]).astype(np.int64)
+
+    done = set(zip(played['HomeTeam'], played['AwayTeam']))
+    remaining = [(h, a) for h in teams for a in teams if h != a and (h, a) not in done]
+    return season, teams, standings, remaining, as_of
+
+def draw_goals(rng, cdf, n):
+    """
+    n draws of every fixture's goals, given (max_goals, fixtures) cumulative probabilities.
+    """
+    u = rng.random((n, cdf.shape[1]), dtype=np.float32)
+    goals = np.zeros((n, cdf.shape[1]))
+    for level in cdf:
+        goals += u > level
+    return goals
+
+def simulate_chunk(args):
+    """
+    Play the remaining fixtures n_sims times in batches and count final positions.
+    Returns (position counts [team, position], summed final points per team).
+    """
+    rates, home_ids, away_ids, standings, n_sims, seed, batch_size = args
+    n_teams = standings.shape[1]
+    rng = np.random.default_rng(seed)
+    # Goals are drawn by inverse CDF against each fixture's Poisson table (capped at
+    # MAX_GOALS), which is several times faster than Generator.poisson with per-cell rates
+    home_cdf = np.cumsum(poisson_pmf(rates[:, 0]), axis=-1)[:, :-1].T.astype(np.float32)
+    away_cdf = np.cumsum(poisson_pmf(rates[:, 1]), axis=-1)[:, :-1].T.astype(np.float32)
+
+    # Fixture -> team incidence matrices turn per-fixture results into per-team totals
+    home_of = np.zeros((len(rates), n_teams))
+    home_of[np.arange(len(rates)), home_ids] = 1
+    away_of = np.zeros((len(rates), n_teams))
+    away_of[np.arange(len(rates)), away_ids] = 1
+
+    counts = np.zeros(n_teams * n_teams, dtype=np.int64)
+    points_sum = np.zeros(n_teams)
+    team_offsets = np.arange(n_teams) * n_teams
+    for start in range(0, n_sims, batch_size):
+        b = min(batch_size, n_sims - start)
+        hg = draw_goals(rng, home_cdf, b)
+        ag = draw_goals(rng, away_cdf, b)
+        home_points = np.where(hg > ag, 3.0, np.where(hg == ag, 1.0, 0.0))
+        away_points = np.where(ag > hg, 3.0, np.where(hg == ag, 1.0, 0.0))
+
+        points = standings[0] + home_points @ home_of + away_points @ away_of
+        goal_diff = standings[1] + (hg - ag) @ (home_of - away_of)
+        goals_for = standings[2] + hg @ home_of + ag @ away_of
+
+        # Points, then goal difference, then goals scored; remaining ties drawn at random
+        order = np.lexsort((rng.random((b, n_teams)), -goals_for, -goal_diff, -points), axis=-1)
+        positions = np.empty_like(order)
+        np.put_along_axis(positions, order, np.arange(n_teams), axis=1)
+        counts += np.bincount((team_offsets + positions).ravel(), minlength=n_teams * n_teams)
+        points_sum += points.sum(axis=0)
+    return counts.reshape(n_teams, n_teams), points_sum
+
+def simulate_season(teams, standings, remaining, n_sims=N_SIMULATIONS, n_jobs=None, seed=42,
+                    batch_size=BATCH_SIZE, as_of=None):
+    """
+    Monte Carlo simulation of the remaining fixtures from the current standings.
+
+    Expected goals for all remaining fixtures come from one batched prediction, from the
+    teams' state as of as_of (see season_fixtures; None uses the latest state); each
+    simulation draws Poisson scorelines for every fixture at once. Simulations are split
+    into independently seeded chunks across a process pool. Returns a DataFrame with
+    current and expected points plus title, top-4 and relegation probabilities.
+    """
+    known = registry.get().team_index.team_ids
+    unknown = [team for team in teams if team not in known]
+    if unknown:
+        raise ValueError(f"Unknown team(s): {', '.join(unknown)}")
+    team_ids = {team: i for i, team in enumerate(teams)}
+    rates = predict_rates(remaining, as_of) if remaining else np.zeros((0, 2))
+    if np.isnan(rates).any():
+        raise ValueError(f"No team history before {as_of} to predict the season from")
+    home_ids = np.array([team_ids[h] for h, _ in remaining], dtype=np.intp)
+    away_ids = np.array([team_ids[a] for _, a in remaining], dtype=np.intp)
+
+    n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, -(-n_sims // batch_size)))
+    sizes = [n_sims // n_jobs + (i < n_sims % n_jobs) for i in range(n_jobs)]
+    seeds = np.random.SeedSequence(seed).spawn(n_jobs)
+    tasks = [(rates, home_ids, away_ids, standings, size, s, batch_size) for size, s in zip(sizes, seeds)]
+    if n_jobs == 1:
+        results = [simulate_chunk(tasks[0])]
+    else:
+        # spawn, not fork: the parent may already hold OpenMP threads from XGBoost
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = list(pool.map(simulate_chunk, tasks))
+
+    counts = sum(r[0] for r in results)
+    points_sum = sum(r[1] for r in results)
+    n_teams = len(teams)
+    table = pd.DataFrame({
+        'Team': teams,
+        'Pts': standings[0],
+        'xPts': points_sum / n_sims,
+        'Title': counts[:, 0] / n_sims,
+        f'Top {TOP_N}': counts[:, :TOP_N].sum(axis=1) / n_sims,
+        'Relegation': counts[:, n_teams - RELEGATED:].sum(axis=1) / n_sims,
+    })
+    return table.sort_values(['xPts', 'Title'], ascending=False, ignore_index=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate the rest of an EPL season.")
+    parser.add_argument('--season', help="season code such as 2425 (default: the latest in the dataset)")
+    parser.add_argument('--simulations', type=int, default=N_SIMULATIONS)
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--fresh', action='store_true', help="simulate the whole season, ignoring results so far")
+    args = parser.parse_args()
+
+    df = load_dataset(['Date', 'Season', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG'])
+    season, teams, standings, remaining, as_of = season_fixtures(df, args.season, args.fresh)
+    print(f"Season {season}: {len(remaining)} fixtures left, {args.simulations:,} simulations"
+          + (f", team state as of {as_of}" if as_of else ""))
+
+    start = time.perf_counter()
+    table = simulate_season(teams, standings, remaining, args.simulations, args.jobs, args.seed, as_of=as_of)
+    elapsed = time.perf_counter() - start
+
+    print(f"\nPredicted winner: {table.loc[table['Title'].idxmax(), 'Team']}\n")
+    formatted = table.copy()
+    formatted['xPts'] = formatted['xPts'].map('{:.1f}'.format)
+    for col in ['Title', f'Top {TOP_N}', 'Relegation']:
+        formatted[col] = formatted[col].map('{:.1%}'.format)
+    formatted.index = formatted.index + 1
+    print(formatted.to_string())
+    print(f"\nSimulated in {elapsed:.1f}s")
@@ -0,0 +1,60 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from atomic import atomic_write_bytes
+
+# Persistent team vocabulary, kept next to the season partitions
+TEAMS_FILE = os.path.join('data', 'teams.json')
+
+class TeamRegistry:
+    """
+    Append-only team vocabulary with stable integer ids.
+
+    A team gets the next free id the first time it is seen and keeps it for good, so
+    encoded columns mean the same team in every season, across incremental rebuilds, in
+    training and in serving. Teams new to a season are numbered in sorted order, so a
+    single season encodes exactly like a LabelEncoder fitted on it.
+    """
+    def __init__(self, teams=()):
+        # teams are taken in id order, as saved
+        self.teams = list(teams)
+        self.ids = {team: i for i, team in enumerate(self.teams)}
+
+    def __len__(self):
+        return len(self.teams)
+
+    def add(self, names):
+        """
+        Register unseen team names; returns the number of new teams.
+        """
+        new = sorted(set(names) - self.ids.keys())
+        for name in new:
+            self.ids[name] = len(self.teams)
+            self.teams.append(name)
+        return len(new)
+
+    def encode(self, names):
+        """
+        int16 ids for a sequence of team names, registering any unseen ones.
+        """
+        names = pd.Series(names)
+        self.add(names.unique())
+        return pd.Categorical(names, categories=self.teams).codes.astype(np.int16)
+
+    def dtype(self):
+        """
+        Categorical dtype whose category codes are the team ids.
+        """
+        return pd.CategoricalDtype(self.teams)
+
+    @classmethod
+    def load(cls, path=TEAMS_FILE):
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            return cls(json.load(f)['teams'])
+
+    def save(self, path=TEAMS_FILE):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        atomic_write_bytes(path, json.dumps({'teams': self.teams}, indent=2).encode())
@@ -0,0 +1,53 @@
+import io
+import json
+import numpy as np
+import pytest
+import bulk
+from predict import UNKNOWN_TEAM
+
+TEAMS = {'Arsenal', 'Chelsea', 'Everton', 'Liverpool'}
+
+def fake_predict_rates(fixtures, as_of=None, state=None, return_errors=False):
+    known = [home in TEAMS and away in TEAMS for home, away in fixtures]
+    rates = np.array([[2.0, 1.0] if ok else [np.nan, np.nan] for ok in known]).reshape(-1, 2)
+    errors = [None if ok else UNKNOWN_TEAM for ok in known]
+    return (rates, errors) if return_errors else rates
+
+@pytest.fixture(autouse=True)
+def no_model(monkeypatch):
+    monkeypatch.setattr(bulk, 'predict_rates', fake_predict_rates)
+
+def run(data, in_format, out_format='ndjson'):
+    text = ''.join(bulk.stream_predictions(bulk.text_lines(io.BytesIO(data)), in_format, out_format, chunk_size=2))
+    return [json.loads(line) for line in text.splitlines()] if out_format == 'ndjson' else text
+
+def test_bad_byte_in_first_line():
+    results = run(b'Arsen\xffal,Chelsea\nEverton,Liverpool\n', 'csv')
+    assert results == [
+        {'error': 'invalid fixture: row 1: not valid UTF-8'},
+        {'home_team': 'Everton', 'away_team': 'Liverpool', 'home_goals': 2, 'away_goals': 1},
+    ]
+
+def test_bad_byte_in_later_line():
+    data = b'home_team,away_team\nArsenal,Chelsea\nEverton,Liverpool\nChel\xc3sea,Arsenal\nLiverpool,Everton\n'
+    results = run(data, 'csv')
+    assert [r.get('error') for r in results] == [None, None, 'invalid fixture: row 4: not valid UTF-8', None]
+    assert results[-1]['home_team'] == 'Liverpool'
+
+def test_bad_byte_in_ndjson_line():
+    data = b'["Arsenal", "Chelsea"]\n["Ever\xfeton", "Liverpool"]\n["Everton", "Liverpool"]\n'
+    results = run(data, 'ndjson')
+    assert [r.get('error') for r in results] == [None, 'invalid fixture: line 2: not valid UTF-8', None]
+
+def test_bom_before_header():
+    data = '\ufeffhome_team,away_team,date\nArsenal,Chelsea,\n'.encode('utf-8')
+    assert run(data, 'csv', 'csv') == 'home_team,away_team,date,home_goals,away_goals,error\nArsenal,Chelsea,,2,1,\n'
+
+def test_invalid_dates_are_row_errors():
+    results = run(b'home_team,away_team,date\nArsenal,Chelsea,5\nArsenal,Chelsea,2019-02-30\n', 'csv')
+    assert all(r['error'].startswith('invalid fixture: row ') for r in results)
+
+@pytest.mark.parametrize('value', [None, '', 5, '2019-5-1', 'NaT'])
+def test_parse_date_rejects(value):
+    with pytest.raises(ValueError):
+        bulk.parse_date(value)
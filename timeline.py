@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+# Rolling windows (in matches) and EWMA half-lives computed by add_timeline_features
+WINDOWS = (3, 5, 10, 38)
+HALFLIVES = (3, 10)
+# Per-match stats from the team's point of view
+STATS = ('GF', 'GA', 'Pts')
+
+def team_timeline(df):
+    """
+    Long-format timeline: one row per team per match, home and away appearances together,
+    across every season in df, sorted by team, then date, then dataset order.
+    Columns: Match (row position in df), Team, Date, Home, GF, GA, Pts.
+    """
+    n = len(df)
+    hg = df['FTHG'].to_numpy(dtype=float)
+    ag = df['FTAG'].to_numpy(dtype=float)
+    home_pts = np.where(hg > ag, 3.0, np.where(hg == ag, 1.0, 0.0))
+    away_pts = np.where(ag > hg, 3.0, np.where(hg == ag, 1.0, 0.0))
+    teams = np.concatenate([df['HomeTeam'].astype(str).to_numpy(), df['AwayTeam'].astype(str).to_numpy()])
+    codes, names = pd.factorize(teams)
+    dates = np.tile(df['Date'].to_numpy(dtype='datetime64[ns]'), 2)
+    match = np.tile(np.arange(n), 2)
+
+    order = np.lexsort((match, dates, codes))
+    return pd.DataFrame({
+        'Match': match[order],
+        'Team': pd.Categorical.from_codes(codes[order], names),
+        'Date': dates[order],
+        'Home': (np.arange(2 * n) < n)[order],
+        'GF': np.concatenate([hg, ag])[order],
+        'GA': np.concatenate([ag, hg])[order],
+        'Pts': np.concatenate([home_pts, away_pts])[order],
+    })
+
+def timeline_stats(timeline, windows=WINDOWS, halflives=HALFLIVES):
+    """
+    Pre-match form for every timeline row: the mean of each stat over the team's previous
+    w matches for every window, and its exponentially weighted mean (pandas ewm with
+    adjust=True) over all previous matches for every half-life. NaN before a team's first
+    match. Everything is computed over the sorted timeline in one pass per column:
+    rolling sums are differences of one cumulative sum, EWMAs one linear recursion, each
+    reset at team boundaries, so the cost is linear in matches whatever the number of
+    teams.
+    """
+    n = len(timeline)
+    codes = timeline['Team'].cat.codes.to_numpy()
+    index = np.arange(n)
+    # First timeline row of each row's team
+    first = np.r_[True, codes[1:] != codes[:-1]] if n else np.zeros(0, dtype=bool)
+    start = np.maximum.accumulate(np.where(first, index, 0)) if n else index
+    position = index - start
+
+    out = {}
+    for stat in STATS:
+        x = timeline[stat].to_numpy(dtype=float)
+        csum = np.concatenate([[0.0], np.cumsum(x)])
+        for w in windows:
+            lo = np.maximum(start, index - w)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out[f"{stat}{w}"] = (csum[index] - csum[lo]) / (index - lo)
+        for h in halflives:
+            out[f"{stat}Ewm{h}"] = ewm_before(x, start, position, 0.5 ** (1.0 / h))
+    return pd.DataFrame(out, index=timeline.index)
+
+def ewm_before(x, start, position, decay):
+    """
+    Exponentially weighted mean of the earlier values in each row's group (rows sorted by
+    group, start = first row of the group), with weights decay**age.
+    """
+    def decayed_sums(values):
+        # s[i] = values[i] + decay * s[i-1] over the whole array, then the carry-over from
+        # the previous group is removed: decay**(position+1) * s[start-1]
+        s = lfilter([1.0], [1.0, -decay], values)
+        carry = np.where(start > 0, s[np.maximum(start - 1, 0)], 0.0)
+        return s - decay ** (position + 1.0) * carry
+
+    weighted = decayed_sums(x)
+    weights = decayed_sums(np.ones_like(x))
+    # Shift by one row: the value before a match only covers the matches before it
+    out = np.full(len(x), np.nan)
+    later = position > 0
+    out[later] = weighted[np.flatnonzero(later) - 1] / weights[np.flatnonzero(later) - 1]
+    return out
+
+def timeline_columns(windows=WINDOWS, halflives=HALFLIVES):
+    """
+    Names of the match-row columns add_timeline_features adds, home side then away side.
+    """
+    stats = [name for stat in STATS for name in [f"{stat}{w}" for w in windows] + [f"{stat}Ewm{h}" for h in halflives]]
+    return [f"Home{name}" for name in stats] + [f"Away{name}" for name in stats]
+
+def add_timeline_features(df, windows=WINDOWS, halflives=HALFLIVES):
+    """
+    Return df with each team's pre-match rolling and EWMA form, computed across seasons
+    and over home and away matches together, as HomeGF5, AwayPtsEwm10, ... columns.
+    """
+    timeline = team_timeline(df)
+    stats = timeline_stats(timeline, windows, halflives).to_numpy()
+    match = timeline['Match'].to_numpy()
+    home = timeline['Home'].to_numpy()
+    # Pivot back to match rows: home appearances fill the first half, away the second
+    k = stats.shape[1]
+    block = np.empty((len(df), 2 * k))
+    block[match[home], :k] = stats[home]
+    block[match[~home], k:] = stats[~home]
+    columns = pd.DataFrame(block, index=df.index, columns=timeline_columns(windows, halflives))
+    return pd.concat([df.drop(columns=columns.columns, errors='ignore'), columns], axis=1)
@@ -0,0 +1,117 @@
+import time
+import argparse
+import numpy as np
+import xgboost as xgb
+from data import DATA_FILE, all_seasons, build_dataset, load_dataset
+from features import FEATURES
+from bundle import load_bundle, save_bundle
+from model import BASE_PARAMS, stage, train_models_parallel
+
+# Gameweek refresh: rebuild only the changed season's features, then add a few boosting
+# rounds to the served models instead of retraining from scratch.
+UPDATE_ROUNDS = 10
+# Smaller steps than the full fit, so a handful of new results nudges the model
+UPDATE_PARAMS = dict(BASE_PARAMS, eta=0.03)
+# Recent matches the new rounds are fitted on alongside the new ones; ten rows on their
+# own would just be memorized
+CONTEXT_MATCHES = 380
+# Chained incremental updates allowed before falling back to a full retrain
+MAX_UPDATES = 10
+KEY_COLUMNS = ['Date', 'HomeTeam', 'AwayTeam']
+
+def match_keys(df):
+    return list(zip(df['Date'], df['HomeTeam'].astype(str), df['AwayTeam'].astype(str)))
+
+def new_match_mask(df, known):
+    """
+    Boolean mask of the rows of df whose (date, home, away) is not in known.
+    """
+    return np.array([key not in known for key in match_keys(df)], dtype=bool)
+
+def continue_boosting(bundle, df, fresh, rounds=UPDATE_ROUNDS):
+    """
+    Continue the bundle's home and away boosters for `rounds` rounds on the fresh rows plus
+    the most recent CONTEXT_MATCHES. The bundle's scaler is kept, so the existing trees
+    still see the inputs they were trained on.
+    """
+    rows = fresh.copy()
+    rows[-CONTEXT_MATCHES:] = True
+    X = bundle.scaler.transform(df.loc[rows, FEATURES].to_numpy(dtype=np.float64))
+    boosters = {}
+    for side, target in [('home', 'FTHG'), ('away', 'FTAG')]:
+        dtrain = xgb.DMatrix(X, label=df.loc[rows, target].to_numpy())
+        base = getattr(bundle, f"{side}_model").booster
+        boosters[side] = xgb.train(UPDATE_PARAMS, dtrain, rounds, xgb_model=base)
+    return boosters['home'], boosters['away'], int(rows.sum())
+
+def update_models(full=False, rounds=UPDATE_ROUNDS, max_updates=MAX_UPDATES, timeline=False):
+    """
+    Pick up newly finished matches and publish an updated model bundle.
+
+    The dataset is rebuilt incrementally, so only seasons whose source changed get their
+    rolling features recomputed. The served boosters are then continued on the new matches
+    and published as a new bundle version; serving picks it up through CURRENT like any
+    other bundle. Falls back to a full retrain when asked to, when there is no usable
+    bundle, or after max_updates chained updates. Returns the new version, or None if
+    there were no new matches. Pass timeline=True if the dataset is built with timeline
+    features, so the rebuild keeps them.
+    """
+    timings = {}
+    try:
+        known = set(match_keys(load_dataset(KEY_COLUMNS)))
+    except FileNotFoundError:
+        known = set()
+
+    with stage(timings, 'rebuild changed seasons'):
+        teams = build_dataset(all_seasons(), incremental=True, timeline=timeline)
+    df = load_dataset(KEY_COLUMNS + FEATURES + ['FTHG', 'FTAG'])
+    fresh = new_match_mask(df, known)
+    print(f"{fresh.sum()} new matches")
+    if not fresh.any() and not full:
+        return None
+
+    try:
+        bundle = load_bundle()
+        training = bundle.manifest.get('training', {})
+        updates = training.get('updates_since_full', 0) if training.get('mode') == 'incremental' else 0
+        reason = ("--full" if full else "model features changed" if bundle.features != FEATURES else
+                  f"{updates} updates since the last full retrain" if updates >= max_updates else None)
+    except FileNotFoundError:
+        bundle, reason = None, "no model bundle"
+
+    if reason:
+        print(f"Full retrain ({reason})")
+        train_models_parallel(df, teams)
+        return load_bundle().version
+
+    with stage(timings, f'continue boosting ({rounds} rounds)'):
+        home_booster, away_booster, n_rows = continue_boosting(bundle, df, fresh, rounds)
+    with stage(timings, 'save bundle'):
+        version = save_bundle(home_booster, away_booster, bundle.scaler, teams, FEATURES, extra={
+            'training': {
+                'mode': 'incremental',
+                'base_version': bundle.version,
+                'updates_since_full': updates + 1,
+                'new_matches': int(fresh.sum()),
+                'rows': n_rows,
+                'params': dict(UPDATE_PARAMS, num_boost_round=rounds),
+                'stage_seconds': dict(timings),
+            },
+        })
+    print(f"Model bundle {version} published (from {bundle.version}). Total {sum(timings.values()):.3f}s")
+    return version
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Add newly finished matches to {DATA_FILE} and update the models.")
+    parser.add_argument('--full', action='store_true', help="retrain from scratch instead of continuing the models")
+    parser.add_argument('--rounds', type=int, default=UPDATE_ROUNDS, help="boosting rounds to add per model")
+    parser.add_argument('--max-updates', type=int, default=MAX_UPDATES,
+                        help="chained incremental updates before a full retrain")
+    parser.add_argument('--timeline', action='store_true', help="keep the timeline features (data.py --timeline)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    version = update_models(args.full, args.rounds, args.max_updates, args.timeline)
+    if version is None:
+        print("No new matches; model unchanged.")
+    print(f"Done in {time.perf_counter() - start:.1f}s")